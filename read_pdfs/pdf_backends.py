@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""PDF text extraction backends, and a benchmark to choose between them.
+
+  pymupdf   fitz (PyMuPDF); default
+  pypdf2    PyPDF2, pure Python
+
+Usage:
+  python pdf_backends.py benchmark [--docs N] [--pages N] [--lines N] [--seed N]
+      [--backend NAME ...] [--corpus DIR] [--output results.json]
+
+Notes:
+  - Every backend opens a document and extracts the text of one page at a
+    time (see PdfDocument); read_pdfs.py picks one with --backend.
+  - The benchmark writes a corpus of small PDFs generated from --seed (plain
+    Helvetica text, no external tools), then extracts it with each backend
+    in a fresh interpreter so the peak RSS is the backend's own. It reports
+    pages/s, peak RSS, and the disagreement rate: the share of pages whose
+    text, with whitespace collapsed, differs from the text that was written,
+    and between each pair of backends.
+  - --corpus keeps the generated PDFs in DIR (and reuses them on the next
+    run with the same options).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import fitz
+except ImportError:  # optional backend
+    fitz = None
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:  # optional backend
+    PdfReader = None
+
+
+DEFAULT_BACKEND = "pymupdf"
+CORPUS_PARAMS = "corpus.json"
+WORDS = (
+    "thread pool executor process queue future lock event buffer cache index page text search phrase "
+    "digest stream socket kernel memory vector matrix tensor graph node edge python library module"
+).split()
+
+
+class PdfDocument(ABC):
+    """An open PDF; pages are numbered from 0."""
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def page_text(self, number: int) -> str: ...
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def iter_pages(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        for number in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.page_text(number)
+
+
+class PyMuPDFDocument(PdfDocument):
+    def __init__(self, path: str) -> None:
+        self._doc = fitz.open(path)
+
+    def __len__(self) -> int:
+        return len(self._doc)
+
+    def page_text(self, number: int) -> str:
+        return self._doc[number].get_text()
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+def load_pdf_in_memory(pdf_path):
+    with open(pdf_path, "rb") as f:
+        return f.read()
+
+
+class PyPDF2Document(PdfDocument):
+    def __init__(self, path: str) -> None:
+        # Reading the whole file first avoids many small reads on network mounts.
+        self._reader = PdfReader(BytesIO(load_pdf_in_memory(path)))
+
+    def __len__(self) -> int:
+        return len(self._reader.pages)
+
+    def page_text(self, number: int) -> str:
+        return self._reader.pages[number].extract_text() or ""
+
+
+BACKENDS: Dict[str, Callable[[str], PdfDocument]] = {}
+if fitz is not None:
+    BACKENDS["pymupdf"] = PyMuPDFDocument
+if PdfReader is not None:
+    BACKENDS["pypdf2"] = PyPDF2Document
+KNOWN_BACKENDS = ("pymupdf", "pypdf2")
+
+
+def open_pdf(path: str, backend: str = DEFAULT_BACKEND) -> PdfDocument:
+    """Open path with the named backend; ValueError if it is not installed."""
+    if backend not in BACKENDS:
+        installed = ", ".join(BACKENDS) or "none"
+        raise ValueError(f"PDF backend {backend!r} is not available (installed: {installed})")
+    return BACKENDS[backend](path)
+
+
+def pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """A minimal PDF 1.4 file with one Helvetica text line per list entry."""
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * index for index in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for page_id, lines in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {page_id + 1} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        ops = ["BT", "/F1 11 Tf", "14 TL", "56 740 Td"]
+        for line in lines:
+            ops.append(f"({pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def generate_corpus(root: Path, params: Dict) -> None:
+    """Write params["docs"] PDFs plus a JSON file with the text of every page."""
+    rng = random.Random(params["seed"])
+    truth: Dict[str, List[str]] = {}
+    for doc in range(params["docs"]):
+        pages = []
+        for _ in range(params["pages"]):
+            lines = []
+            for _ in range(params["lines"]):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(4, 12))]
+                if rng.random() < 0.2:
+                    words.append(f"({rng.randint(0, 9999)})")
+                lines.append(" ".join(words))
+            pages.append(lines)
+        name = f"doc{doc:04d}.pdf"
+        (root / name).write_bytes(make_pdf(pages))
+        truth[name] = ["\n".join(lines) for lines in pages]
+    (root / CORPUS_PARAMS).write_text(json.dumps({"params": params, "truth": truth}), encoding="utf-8")
+
+
+def corpus_matches(root: Path, params: Dict) -> bool:
+    try:
+        return json.loads((root / CORPUS_PARAMS).read_text(encoding="utf-8"))["params"] == params
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def peak_rss_kib() -> Optional[int]:
+    # VmHWM belongs to this process alone, unlike ru_maxrss after a fork.
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_backend(backend: str, root: Path, texts_path: Path) -> Dict:
+    """Extract every page of the corpus with one backend (run in a child)."""
+    names = sorted(path.name for path in root.glob("*.pdf"))
+    texts: Dict[str, List[str]] = {}
+    start = time.perf_counter()
+    for name in names:
+        with open_pdf(str(root / name), backend) as doc:
+            texts[name] = list(doc.iter_pages())
+    seconds = time.perf_counter() - start
+    texts_path.write_text(json.dumps(texts), encoding="utf-8")
+    pages = sum(len(pages) for pages in texts.values())
+    return {"seconds": seconds, "pages": pages, "peak_rss_kib": peak_rss_kib()}
+
+
+def disagreement(a: Dict[str, List[str]], b: Dict[str, List[str]]) -> float:
+    """Share of pages whose whitespace-normalised text differs."""
+    total = differ = 0
+    for name, pages in a.items():
+        other = b.get(name, [])
+        for number, text in enumerate(pages):
+            total += 1
+            differ += number >= len(other) or normalize(text) != normalize(other[number])
+    return differ / total if total else 0.0
+
+
+def benchmark(root: Path, backends: List[str]) -> Dict[str, Dict]:
+    truth = json.loads((root / CORPUS_PARAMS).read_text(encoding="utf-8"))["truth"]
+    results: Dict[str, Dict] = {}
+    texts: Dict[str, Dict[str, List[str]]] = {}
+    with tempfile.TemporaryDirectory(prefix="pdf-bench-") as scratch:
+        for backend in backends:
+            texts_path = Path(scratch) / f"{backend}.json"
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "benchmark",
+                    "--run-backend",
+                    backend,
+                    "--corpus",
+                    str(root),
+                    "--texts",
+                    str(texts_path),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            texts[backend] = json.loads(texts_path.read_text(encoding="utf-8"))
+            result["pages_per_s"] = result["pages"] / max(result["seconds"], 1e-9)
+            result["disagreement_vs_source"] = disagreement(truth, texts[backend])
+            results[backend] = result
+    for backend in backends:
+        results[backend]["disagreement_vs"] = {
+            other: disagreement(texts[backend], texts[other]) for other in backends if other != backend
+        }
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="PDF text backends.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("benchmark", help="Measure the backends on a synthetic corpus")
+    bench.add_argument("--docs", type=int, default=20, help="Number of PDFs to generate")
+    bench.add_argument("--pages", type=int, default=50, help="Pages per PDF")
+    bench.add_argument("--lines", type=int, default=40, help="Text lines per page")
+    bench.add_argument("--seed", type=int, default=1, help="Random seed for the corpus")
+    bench.add_argument(
+        "--backend",
+        action="append",
+        choices=KNOWN_BACKENDS,
+        help="Backend to measure (repeatable, default all installed)",
+    )
+    bench.add_argument("--corpus", type=Path, help="Where to generate (or reuse) the corpus")
+    bench.add_argument("--output", type=Path, help="Write results to this JSON file")
+    bench.add_argument("--run-backend", choices=KNOWN_BACKENDS, help=argparse.SUPPRESS)
+    bench.add_argument("--texts", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.run_backend:
+        print(json.dumps(run_backend(args.run_backend, args.corpus, args.texts)))
+        return
+
+    backends = args.backend or list(BACKENDS)
+    missing = [backend for backend in backends if backend not in BACKENDS]
+    if missing or not backends:
+        raise SystemExit(f"not installed: {', '.join(missing) or 'any PDF backend'}")
+    params = {"docs": args.docs, "pages": args.pages, "lines": args.lines, "seed": args.seed}
+    root = args.corpus or Path(tempfile.mkdtemp(prefix="pdf-corpus-"))
+    if not corpus_matches(root, params):
+        if args.corpus is not None and root.exists() and any(root.iterdir()):
+            raise SystemExit(f"{root} is not empty and was not generated with these options")
+        root.mkdir(parents=True, exist_ok=True)
+        print(f"Generating {args.docs} PDFs of {args.pages} pages in {root}")
+        generate_corpus(root, params)
+    try:
+        results = benchmark(root, backends)
+    finally:
+        if args.corpus is None:
+            shutil.rmtree(root)
+
+    for backend, result in results.items():
+        others = "  ".join(f"vs {other} {rate:.1%}" for other, rate in result["disagreement_vs"].items())
+        rss = f"{result['peak_rss_kib'] / 1024:7.1f} MiB" if result["peak_rss_kib"] else "    n/a"
+        print(
+            f"{backend:>8}: {result['pages_per_s']:8.0f} pages/s  {rss} RSS  "
+            f"differs from source on {result['disagreement_vs_source']:.1%} of pages  {others}"
+        )
+    if args.output:
+        report = {"params": params, "results": results}
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
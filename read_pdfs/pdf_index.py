@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Full-text index of a PDF library, so searches do not re-extract every page.
+
+Usage:
+  python pdf_index.py index "/path/to/pdf books" [--db pdf_index.db] [--workers N]
+      [--backend pymupdf|pypdf2]
+  python pdf_index.py search "ThreadPoolExecutor" [--db pdf_index.db] [--limit N]
+
+Notes:
+  - index extracts the text of each page once into a SQLite FTS5 table.
+    Files are keyed on path, size and mtime: a rerun only extracts PDFs that
+    are new or changed, and drops the ones that are gone.
+  - Progress is committed file by file, in the order extraction finishes,
+    so an interrupted index run keeps what it finished.
+  - The pages of a file get consecutive rowids, recorded in page_rows, so
+    replacing or dropping a file deletes a rowid range instead of scanning
+    the FTS table for its file_id.
+  - search matches the words of the sentence as a phrase (case-insensitive,
+    punctuation ignored) and prints file, page number and a snippet.
+  - PDFs that cannot be opened are recorded with no pages and retried only
+    when they change.
+  - --backend picks the text extraction library (see pdf_backends.py). It
+    applies to files extracted by this run; unchanged files keep the text
+    already indexed, so use a fresh --db to re-extract everything.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pdf_backends import BACKENDS, DEFAULT_BACKEND, KNOWN_BACKENDS, open_pdf
+
+
+DEFAULT_DB = Path("pdf_index.db")
+SNIPPET_TOKENS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    page_count INTEGER NOT NULL,
+    error TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    text, file_id UNINDEXED, page UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS page_rows (
+    file_id INTEGER PRIMARY KEY,
+    first_rowid INTEGER NOT NULL,
+    last_rowid INTEGER NOT NULL
+);
+"""
+
+
+class Hit(NamedTuple):
+    path: str
+    page: int  # 1-based
+    snippet: str
+
+
+class IndexStats(NamedTuple):
+    indexed: int
+    unchanged: int
+    removed: int
+    failed: int
+    pages: int
+
+
+def get_pdf_files(folder_path: str) -> Iterator[Tuple[str, int, int]]:
+    """Yield (path, size, mtime_ns) for every PDF under folder_path."""
+    for root, _, files in os.walk(folder_path):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime_ns
+
+
+def extract_pages(pdf_path: str, backend: str = DEFAULT_BACKEND) -> Tuple[str, List[str], Optional[str]]:
+    """Return (path, text per page, error message or None)."""
+    try:
+        with open_pdf(pdf_path, backend) as doc:
+            return pdf_path, list(doc.iter_pages()), None
+    except Exception as exc:  # the backends raise several unrelated types for broken files
+        return pdf_path, [], f"{type(exc).__name__}: {exc}"
+
+
+def open_index(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def iter_extracted(
+    paths: List[str], workers: int, backend: str = DEFAULT_BACKEND
+) -> Iterator[Tuple[str, List[str], Optional[str]]]:
+    """Yield extract_pages results in the order they finish.
+
+    At most workers * 2 files are in flight, so only the text of finished
+    files waiting to be stored is held in memory.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield extract_pages(path, backend)
+        return
+    pending = iter(paths)
+    with ProcessPoolExecutor(workers) as pool:
+        running = set()
+        try:
+            while True:
+                while len(running) < workers * 2:
+                    path = next(pending, None)
+                    if path is None:
+                        break
+                    running.add(pool.submit(extract_pages, path, backend))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+
+def delete_file(conn: sqlite3.Connection, file_id: int) -> None:
+    row = conn.execute("SELECT first_rowid, last_rowid FROM page_rows WHERE file_id = ?", (file_id,)).fetchone()
+    if row is not None:
+        conn.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?", row)
+        conn.execute("DELETE FROM page_rows WHERE file_id = ?", (file_id,))
+    else:
+        # Indexed before page_rows existed; this scans the whole table.
+        conn.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def add_pages(conn: sqlite3.Connection, file_id: int, texts: List[str]) -> None:
+    """Store the non-empty pages of a file under consecutive rowids."""
+    rows = [(text, file_id, number) for number, text in enumerate(texts, 1) if text.strip()]
+    if not rows:
+        return
+    last = conn.execute("SELECT rowid FROM pages ORDER BY rowid DESC LIMIT 1").fetchone()
+    first = (last[0] if last is not None else 0) + 1
+    conn.executemany(
+        "INSERT INTO pages (rowid, text, file_id, page) VALUES (?, ?, ?, ?)",
+        ((first + offset, *row) for offset, row in enumerate(rows)),
+    )
+    conn.execute(
+        "INSERT INTO page_rows (file_id, first_rowid, last_rowid) VALUES (?, ?, ?)",
+        (file_id, first, first + len(rows) - 1),
+    )
+
+
+def update_index(
+    conn: sqlite3.Connection,
+    folder_path: str,
+    workers: int = 1,
+    verbose: bool = True,
+    backend: str = DEFAULT_BACKEND,
+) -> IndexStats:
+    """Bring the index in line with the PDFs under folder_path."""
+    known: Dict[str, Tuple[int, int, int]] = {}
+    for file_id, path, size, mtime_ns in conn.execute("SELECT id, path, size, mtime_ns FROM files"):
+        known[path] = (file_id, size, mtime_ns)
+    prefix = os.path.join(os.path.abspath(folder_path), "")
+    changed: Dict[str, Tuple[int, int]] = {}
+    unchanged = 0
+    for path, size, mtime_ns in get_pdf_files(os.path.abspath(folder_path)):
+        entry = known.pop(path, None)
+        if entry is not None and entry[1:] == (size, mtime_ns):
+            unchanged += 1
+        else:
+            changed[path] = (size, mtime_ns)
+
+    # Only files under this folder can have disappeared from it.
+    removed = [file_id for path, (file_id, _, _) in known.items() if path.startswith(prefix)]
+    for file_id in removed:
+        delete_file(conn, file_id)
+    conn.commit()
+
+    indexed = failed = pages = 0
+    # Largest files first, so one big book does not finish the run alone.
+    order = sorted(changed, key=lambda path: -changed[path][0])
+    for path, texts, error in iter_extracted(order, workers, backend):
+        size, mtime_ns = changed[path]
+        row = conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            delete_file(conn, row[0])
+        file_id = conn.execute(
+            "INSERT INTO files (path, size, mtime_ns, page_count, error) VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, len(texts), error),
+        ).lastrowid
+        add_pages(conn, file_id, texts)
+        conn.commit()
+        if error is None:
+            indexed += 1
+            pages += len(texts)
+        else:
+            failed += 1
+        if verbose:
+            status = f"{len(texts)} pages" if error is None else f"failed ({error})"
+            print(f"Indexed {os.path.basename(path)}: {status}")
+    return IndexStats(indexed, unchanged, len(removed), failed, pages)
+
+
+def phrase_query(sentence: str) -> str:
+    """FTS5 query matching the sentence as one phrase."""
+    return '"' + sentence.replace('"', '""') + '"'
+
+
+def search(conn: sqlite3.Connection, sentence: str, limit: Optional[int] = None) -> List[Hit]:
+    """Return the pages containing the sentence, best matches first."""
+    sql = (
+        "SELECT files.path, pages.page, snippet(pages, 0, '[', ']', '...', ?) "
+        "FROM pages JOIN files ON files.id = pages.file_id "
+        "WHERE pages MATCH ? ORDER BY rank"
+    )
+    params: List[object] = [SNIPPET_TOKENS, phrase_query(sentence)]
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [Hit(path, page, " ".join(snippet.split())) for path, page, snippet in conn.execute(sql, params)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Index PDF page text and search it.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Add new and changed PDFs to the index")
+    index.add_argument("pdfs_path", help="Folder with the PDF library")
+    index.add_argument("--workers", type=int, default=0, help="Extraction processes (0=cpu count)")
+    index.add_argument("--quiet", action="store_true", help="Only print the summary")
+    index.add_argument(
+        "--backend", choices=KNOWN_BACKENDS, default=DEFAULT_BACKEND, help="PDF text extraction library"
+    )
+
+    find = commands.add_parser("search", help="Find pages containing a sentence")
+    find.add_argument("sentence", help="Sentence to look for")
+    find.add_argument("--limit", type=int, default=0, help="Maximum number of pages to print (0=all)")
+
+    for command in (index, find):
+        command.add_argument("--db", type=Path, default=DEFAULT_DB, help="SQLite index file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "index":
+        if args.backend not in BACKENDS:
+            raise SystemExit(f"PDF backend {args.backend} is not installed (see pdf_backends.py)")
+        if not os.path.isdir(args.pdfs_path):
+            raise SystemExit(f"not a directory: {args.pdfs_path}")
+        workers = args.workers or max(os.cpu_count() or 1, 1)
+        start = time.perf_counter()
+        with open_index(args.db) as conn:
+            stats = update_index(conn, args.pdfs_path, workers, not args.quiet, args.backend)
+        print(
+            f"Indexed {stats.indexed} PDFs ({stats.pages} pages), {stats.unchanged} unchanged, "
+            f"{stats.removed} removed, {stats.failed} failed in {time.perf_counter() - start:.1f}s"
+        )
+        return
+
+    if not args.db.exists():
+        raise SystemExit(f"no index at {args.db}; run the index command first")
+    conn = open_index(args.db)
+    start = time.perf_counter()
+    hits = search(conn, args.sentence, args.limit)
+    elapsed = time.perf_counter() - start
+    for hit in hits:
+        print(f"{hit.path}:{hit.page}: {hit.snippet}")
+    print(f"{len(hits)} pages in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,64 @@
-import os
-import re
-from PyPDF2 import PdfReader
-import concurrent.futures
-from io import BytesIO
-import fitz
-
+#!/usr/bin/env python3
+"""Search a folder of PDFs for one or many phrases.
 
-def load_pdf_in_memory(pdf_path):
-    with open(pdf_path, "rb") as f:
-        return f.read()
+Usage:
+  python read_pdfs.py "ThreadPoolExecutor" ["asyncio.gather" ...] [--phrases-file FILE]
+      [--max-hits N] [--pdfs-path PATH] [--workers N] [--mode process|thread] [--split-pages N]
+      [--backend pymupdf|pypdf2] [--text-cache PATH [--cache-size SIZE]]
 
+Notes:
+  - All phrases are compiled into one case-insensitive regex, so each page
+    is extracted and scanned once however many phrases there are. The
+    report lists, per file, the pages each phrase was found on.
+  - --phrases-file reads one phrase per line (blank lines and lines
+    starting with # are skipped).
+  - --max-hits N stops looking for a phrase once N pages contain it;
+    files not started yet skip it, and the run ends early when every
+    phrase is done.
+  - --backend picks the text extraction library (pdf_backends.py compares
+    them); pymupdf is the default.
+  - --text-cache PATH keeps the extracted text of every page, compressed
+    and keyed by the PDF's content (see text_cache.py), so later searches
+    only read it back. --cache-size bounds it (default 1G).
+  - Text extraction is CPU-bound, so by default each PDF is searched in a
+    process pool with one worker per core. --mode thread keeps the old
+    thread pool.
+  - Files are scheduled largest first. Documents with more than
+    --split-pages pages (only files over 8 MiB are checked) are split into
+    page ranges that run in parallel, so one huge book does not set the
+    wall time alone.
+  - Each file is reported with the time spent searching it.
+  - For repeated searches over the same library, pdf_index.py answers from
+    an index instead of re-extracting every page.
+"""
 
-# def search_sentence_in_pdf(pdf_path, sentence):
-#     pattern = re.compile(re.escape(sentence), re.IGNORECASE)
-#     found = False
-
-#     reader = PdfReader(BytesIO(load_pdf_in_memory(pdf_path)))
+import argparse
+import concurrent.futures
+import os
+import re
+import threading
+import time
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
-#     for page in reader.pages:
-#         text = page.extract_text()
+from pdf_backends import BACKENDS, DEFAULT_BACKEND, KNOWN_BACKENDS, open_pdf
+from text_cache import DEFAULT_MAX_BYTES, PageTextCache, parse_size
 
-#         if text and pattern.search(text):
-#             found = True
-#             break
 
-#     return found
+SPLIT_PAGES = 200  # documents longer than this are searched in page ranges
+SPLIT_MIN_BYTES = 8 * 1024 * 1024  # smaller files are not opened to count their pages
+DEFAULT_PDFS_PATH = "/media/eavelar/860/MEGA/pdf books repo/"
+# DEFAULT_PDFS_PATH = "/home/eavelar/Documents/"
 
-def search_sentence_in_pdf(pdf_path, sentence):
 
+def search_sentence_in_pdf(pdf_path, sentence, start=0, stop=None, backend=DEFAULT_BACKEND):
+    """Return True if the sentence is on a page in [start, stop) of the PDF."""
     pattern = re.compile(re.escape(sentence), re.IGNORECASE)
     found = False
 
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text = page.get_text()
+    with open_pdf(pdf_path, backend) as doc:
+        for text in doc.iter_pages(start, stop):
             if text and pattern.search(text):
                 found = True
                 break
@@ -49,20 +74,333 @@ def get_pdf_files(folder_path):
                 pdf_files.append(os.path.join(root, file))
     return pdf_files
 
-pdfs_path = "/media/eavelar/860/MEGA/pdf books repo/"
-# pdfs_path = "/home/eavelar/Documents/"
-sentence = "ThreadPoolExecutor"
 
-pdf_files = get_pdf_files(pdfs_path)
+class PhraseMatcher:
+    """Finds which of many phrases occur in a text, in one regex pass.
+
+    The regex is a lookahead over the alternation of all phrases (longest
+    first), so it reports a match at every position where some phrase
+    starts. A shorter phrase that is a prefix of the one matched there is
+    recorded with it.
+    """
+
+    def __init__(self, phrases: Iterable[str]) -> None:
+        self.names: Dict[str, str] = {}  # lowercased phrase -> phrase as given
+        for phrase in phrases:
+            self.names.setdefault(phrase.lower(), phrase)
+        self.keys = sorted(self.names, key=len, reverse=True)
+        self.prefixes = {
+            key: [other for other in self.keys if other != key and key.startswith(other)] for key in self.keys
+        }
+        # One group per phrase, built from the phrase as given: lowercasing
+        # first can change its length (a dotted capital I), and IGNORECASE
+        # would then no longer match the original spelling. The group that
+        # matched names the phrase, so no case mapping is needed afterwards.
+        alternation = "|".join(f"({re.escape(self.names[key])})" for key in self.keys)
+        self.regex = re.compile(f"(?=(?:{alternation}))", re.IGNORECASE)
+
+    def find(self, text: str) -> Set[str]:
+        """Return the phrases (as given) that occur in text."""
+        found: Set[str] = set()
+        for match in self.regex.finditer(text):
+            key = self.keys[match.lastindex - 1]
+            found.add(key)
+            found.update(self.prefixes[key])
+            if len(found) == len(self.prefixes):
+                break
+        return {self.names[key] for key in found}
+
+
+@lru_cache(maxsize=8)
+def phrase_matcher(phrases: FrozenSet[str]) -> PhraseMatcher:
+    # Tasks in one worker mostly share a phrase set; compile it once.
+    return PhraseMatcher(phrases)
+
+
+def extract_page_texts(
+    pdf_path: str, start: int = 0, stop: Optional[int] = None, backend: str = DEFAULT_BACKEND
+) -> Tuple[int, List[str]]:
+    """Return (page count, text of pages [start, stop))."""
+    with open_pdf(pdf_path, backend) as doc:
+        return len(doc), list(doc.iter_pages(start, stop))
+
+
+def iter_page_texts(
+    pdf_path: str,
+    start: int = 0,
+    stop: Optional[int] = None,
+    cache: Optional[PageTextCache] = None,
+    backend: str = DEFAULT_BACKEND,
+) -> Iterator[Tuple[int, str]]:
+    """Yield (0-based page number, text) for pages in [start, stop)."""
+    if cache is not None:
+        # Cached ranges are extracted whole, so that they can be stored.
+        extract = partial(extract_page_texts, backend=backend)
+        yield from enumerate(cache.pages(pdf_path, extract, start, stop), start)
+        return
+    with open_pdf(pdf_path, backend) as doc:
+        yield from enumerate(doc.iter_pages(start, stop), start)
+
+
+def search_phrases_in_pdf(pdf_path, phrases, start=0, stop=None, max_hits=0, cache=None, backend=DEFAULT_BACKEND):
+    """Return {phrase: [1-based page numbers]} for pages in [start, stop).
+
+    With max_hits a phrase is no longer looked for once it has that many
+    pages, and the scan stops when every phrase has.
+    """
+    matcher = phrase_matcher(frozenset(phrases))
+    hits: Dict[str, List[int]] = {}
+    wanted = len(matcher.names)
+
+    for number, text in iter_page_texts(pdf_path, start, stop, cache, backend):
+        if not text:
+            continue
+        for phrase in matcher.find(text):
+            pages = hits.setdefault(phrase, [])
+            if not max_hits or len(pages) < max_hits:
+                pages.append(number + 1)
+        if max_hits and sum(len(pages) >= max_hits for pages in hits.values()) == wanted:
+            break
+
+    return hits
+
+
+class Task(NamedTuple):
+    path: str
+    start: int
+    stop: Optional[int]  # None: to the last page
+
+
+class FileResult(NamedTuple):
+    path: str
+    hits: Dict[str, List[int]]  # phrase -> pages
+    seconds: float  # summed over the file's page ranges
+    tasks: int
+
+
+def page_count(pdf_path: str, backend: str = DEFAULT_BACKEND) -> int:
+    try:
+        with open_pdf(pdf_path, backend) as doc:
+            return len(doc)
+    except Exception:  # broken files are reported by the search itself
+        return 0
+
+
+def plan_tasks(pdf_files: List[str], split_pages: int, backend: str = DEFAULT_BACKEND) -> List[Task]:
+    """One task per file, or per page range for long documents, largest first."""
+    sized = []
+    for path in pdf_files:
+        try:
+            sized.append((os.path.getsize(path), path))
+        except OSError:
+            continue
+    sized.sort(reverse=True)
+
+    tasks: List[Tuple[int, Task]] = []
+    for size, path in sized:
+        pages = page_count(path, backend) if split_pages and size >= SPLIT_MIN_BYTES else 0
+        if pages <= split_pages:
+            tasks.append((size, Task(path, 0, None)))
+            continue
+        # Ranges of one file keep the file's place in the largest-first order.
+        ranges = -(-pages // split_pages)
+        for start in range(0, pages, split_pages):
+            tasks.append((size // ranges, Task(path, start, start + split_pages)))
+    tasks.sort(key=lambda item: -item[0])
+    return [task for _, task in tasks]
+
+
+class TaskResult(NamedTuple):
+    task: Task
+    hits: Dict[str, List[int]]
+    seconds: float
+    error: Optional[str]
+    cached_pages: int  # read from the text cache
+    extracted_pages: int  # extracted and stored in the text cache
+
+
+_caches = threading.local()
+
+
+def open_cache(cache_spec: Optional[Tuple[str, int]], backend: str = DEFAULT_BACKEND) -> Optional[PageTextCache]:
+    """The text cache for this worker; each process or thread keeps its own connection."""
+    if cache_spec is None:
+        return None
+    path, max_bytes = cache_spec
+    caches = _caches.__dict__.setdefault("by_path", {})
+    if (path, backend) not in caches:
+        variant = "" if backend == DEFAULT_BACKEND else backend
+        caches[path, backend] = PageTextCache(Path(path), max_bytes, variant)
+    return caches[path, backend]
+
+
+def run_task(
+    task: Task,
+    phrases: Tuple[str, ...],
+    max_hits: int,
+    cache_spec: Optional[Tuple[str, int]] = None,
+    backend: str = DEFAULT_BACKEND,
+) -> TaskResult:
+    """Search one task, timing it; errors are returned instead of raised."""
+    start = time.perf_counter()
+    cache = open_cache(cache_spec, backend)
+    try:
+        hits = search_phrases_in_pdf(task.path, phrases, task.start, task.stop, max_hits, cache, backend)
+        error = None
+    except Exception as exc:  # one broken PDF must not stop the run
+        hits, error = {}, f"{type(exc).__name__}: {exc}"
+    cached = extracted = 0
+    if cache is not None:
+        cached, extracted = cache.hits, cache.misses
+        cache.flush()
+    return TaskResult(task, hits, time.perf_counter() - start, error, cached, extracted)
+
+
+def search_pdfs(
+    pdf_files: List[str],
+    phrases: List[str],
+    workers: int,
+    mode: str = "process",
+    split_pages: int = SPLIT_PAGES,
+    max_hits: int = 0,
+    cache_spec: Optional[Tuple[str, int]] = None,
+    backend: str = DEFAULT_BACKEND,
+) -> List[FileResult]:
+    """Search every file for every phrase and print each file as it finishes."""
+    tasks = plan_tasks(pdf_files, split_pages, backend)
+    task_counts: Dict[str, int] = {}
+    for task in tasks:
+        task_counts[task.path] = task_counts.get(task.path, 0) + 1
+    remaining = dict(task_counts)
+    hits: Dict[str, Dict[str, List[int]]] = {}
+    seconds: Dict[str, float] = {}
+    total_hits = {phrase: 0 for phrase in phrases}
+    cache_pages = [0, 0]  # read from the cache, extracted into it
+    results = []
+
+    def open_phrases() -> Tuple[str, ...]:
+        return tuple(phrase for phrase in phrases if not max_hits or total_hits[phrase] < max_hits)
+
+    executor_class = (
+        concurrent.futures.ProcessPoolExecutor if mode == "process" else concurrent.futures.ThreadPoolExecutor
+    )
+    pending = iter(tasks)
+    with executor_class(max_workers=workers) as executor:
+        # Tasks are submitted a few at a time so later ones only carry the
+        # phrases that still need hits.
+        running = set()
+        while True:
+            wanted = open_phrases()
+            while wanted and len(running) < workers * 2:
+                task = next(pending, None)
+                if task is None:
+                    break
+                running.add(executor.submit(run_task, task, wanted, max_hits, cache_spec, backend))
+            if not running:
+                break
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                task, task_hits, task_seconds, error, cached, extracted = future.result()
+                cache_pages[0] += cached
+                cache_pages[1] += extracted
+                file_name = os.path.basename(task.path)
+                if error is not None:
+                    print(f"Could not read {file_name}: {error}")
+                file_hits = hits.setdefault(task.path, {})
+                for phrase, pages in task_hits.items():
+                    file_hits.setdefault(phrase, []).extend(pages)
+                seconds[task.path] = seconds.get(task.path, 0.0) + task_seconds
+                remaining[task.path] -= 1
+                if remaining[task.path]:
+                    continue
+                kept: Dict[str, List[int]] = {}
+                for phrase in phrases:
+                    pages = sorted(file_hits.get(phrase, ()))
+                    if max_hits:
+                        pages = pages[: max(max_hits - total_hits[phrase], 0)]
+                    total_hits[phrase] += len(pages)
+                    if pages:
+                        kept[phrase] = pages
+                result = FileResult(task.path, kept, seconds[task.path], task_counts[task.path])
+                results.append(result)
+                print(f"Searched: {file_name} ({result.seconds:.2f}s)")
+                for phrase, pages in result.hits.items():
+                    print(f"  {phrase!r} on pages {', '.join(map(str, pages))}")
+    if cache_spec is not None:
+        print(f"Text cache {cache_spec[0]}: {cache_pages[0]} pages cached, {cache_pages[1]} extracted")
+    return results
+
+
+def read_phrases(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Search a folder of PDFs for one or many phrases.")
+    parser.add_argument("phrases", nargs="*", help="Phrases to look for (case-insensitive)")
+    parser.add_argument("--phrases-file", help="File with one phrase per line")
+    parser.add_argument("--max-hits", type=int, default=0, help="Stop looking for a phrase after N pages (0=no limit)")
+    parser.add_argument("--pdfs-path", default=DEFAULT_PDFS_PATH, help="Folder with the PDFs")
+    parser.add_argument("--workers", type=int, default=0, help="Workers (0=cpu count)")
+    parser.add_argument(
+        "--mode",
+        choices=("process", "thread"),
+        default="process",
+        help="Worker pool type; processes avoid the GIL during extraction",
+    )
+    parser.add_argument(
+        "--split-pages",
+        type=int,
+        default=SPLIT_PAGES,
+        help="Search longer documents in ranges of this many pages (0=never split)",
+    )
+    parser.add_argument(
+        "--backend", choices=KNOWN_BACKENDS, default=DEFAULT_BACKEND, help="PDF text extraction library"
+    )
+    parser.add_argument("--text-cache", help="SQLite cache of extracted page text to read and update")
+    parser.add_argument(
+        "--cache-size", type=parse_size, default=DEFAULT_MAX_BYTES, help="Text cache limit (e.g. 500M, 2G)"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not os.path.isdir(args.pdfs_path):
+        raise SystemExit(f"not a directory: {args.pdfs_path}")
+    phrases = list(args.phrases)
+    if args.phrases_file:
+        phrases.extend(read_phrases(args.phrases_file))
+    # Phrases differing only in case are one phrase.
+    phrases = list(PhraseMatcher(phrases).names.values())
+    if not phrases:
+        raise SystemExit("no phrases given")
+    if args.backend not in BACKENDS:
+        raise SystemExit(f"PDF backend {args.backend} is not installed (see pdf_backends.py)")
+    workers = args.workers or max(os.cpu_count() or 1, 1)
+
+    start = time.perf_counter()
+    pdf_files = get_pdf_files(args.pdfs_path)
+    cache_spec = (os.path.abspath(args.text_cache), args.cache_size) if args.text_cache else None
+    results = search_pdfs(
+        pdf_files, phrases, workers, args.mode, args.split_pages, args.max_hits, cache_spec, args.backend
+    )
+    elapsed = time.perf_counter() - start
 
-def process_pdf(pdf_path):
-    file_name = os.path.basename(pdf_path)
-    print(f"Searching in: {file_name}")
-    found = search_sentence_in_pdf(pdf_path, sentence)
-    if found:
-        print(f"Found in: {file_name}")
+    slowest = sorted(results, key=lambda result: -result.seconds)[:5]
+    if slowest:
+        print("Slowest files:")
+        for result in slowest:
+            print(f"  {result.seconds:8.2f}s  {os.path.basename(result.path)} ({result.tasks} tasks)")
+    print("Hits per phrase:")
+    for phrase in phrases:
+        files = [result for result in results if phrase in result.hits]
+        pages = sum(len(result.hits[phrase]) for result in files)
+        print(f"  {pages:6d} pages in {len(files):5d} PDFs  {phrase!r}")
+    print(f"Searched {len(results)} PDFs in {elapsed:.1f}s with {workers} {args.mode} workers")
 
-max_workers = 20
 
-with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-    executor.map(process_pdf, pdf_files)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,45 @@
-def search_sentence_in_pdf(pdf_path, sentence):
+#!/usr/bin/env python3
+"""Check whether one PDF contains a sentence.
+
+Usage:
+  python search_sentence_in_pdf.py book.pdf "ThreadPoolExecutor" [--backend pymupdf|pypdf2]
+
+Notes:
+  - Pages are read through pdf_backends.py; PyPDF2 is the default here, as
+    it always was for this script. read_pdfs.py searches a whole folder.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+
+from pdf_backends import KNOWN_BACKENDS, open_pdf
+
+
+def search_sentence_in_pdf(pdf_path: str, sentence: str, backend: str = "pypdf2") -> bool:
     pattern = re.compile(re.escape(sentence), re.IGNORECASE)
-    found = False
+    with open_pdf(pdf_path, backend) as doc:
+        return any(text and pattern.search(text) for text in doc.iter_pages())
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check whether a PDF contains a sentence.")
+    parser.add_argument("pdf_path", help="PDF file to search")
+    parser.add_argument("sentence", help="Sentence to look for (case-insensitive)")
+    parser.add_argument("--backend", choices=KNOWN_BACKENDS, default="pypdf2", help="PDF text extraction library")
+    return parser.parse_args()
+
 
-    reader = PdfReader(pdf_path)
+def main() -> None:
+    args = parse_args()
+    try:
+        found = search_sentence_in_pdf(args.pdf_path, args.sentence, args.backend)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    print(f"{'Found' if found else 'Not found'} in {args.pdf_path}")
+    raise SystemExit(0 if found else 1)
 
-    for page in reader.pages:
-        text = page.extract_text()
-        if text and pattern.search(text):
-            found = True
-            break
 
-    return found
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""On-disk cache of extracted PDF page text, keyed by the PDF's content.
+
+Usage:
+  python text_cache.py stats [--cache pdf_text_cache.db]
+  python text_cache.py clear [--cache pdf_text_cache.db]
+
+Notes:
+  - Page text is stored zlib-compressed in SQLite under a blake2b digest of
+    the PDF bytes, so a renamed, moved or copied file still hits. The
+    digest of each path is remembered with its size and mtime, so an
+    unchanged file is not read again to find its digest.
+  - Pages are cached per page, so the page ranges of a split document
+    fill the cache independently. Text from a non-default extraction
+    backend is cached separately (see pdf_backends.py).
+  - The cache is bounded by the compressed size of the text; when a store
+    goes over the limit, least recently used documents are evicted whole.
+  - read_pdfs.py uses it with --text-cache PATH.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+DEFAULT_CACHE = Path("pdf_text_cache.db")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB of compressed text
+READ_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}  # as in tools/patterns.py
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    digest TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    digest TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text BLOB NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    PRIMARY KEY (digest, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# (pdf_path, start, stop) -> (page count of the document, text of pages [start, stop))
+Extractor = Callable[[str, int, Optional[int]], Tuple[int, List[str]]]
+
+
+# Copied from tools/patterns.py (read_pdfs/ does not import from tools/);
+# keep the accepted forms of the two in step.
+def parse_size(text: str) -> int:
+    """Parse "512", "10k", "1.5M" or "2GiB" into bytes (binary units)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def file_digest(path: str) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as handle:
+        while True:
+            chunk = handle.read(READ_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class PageTextCache:
+    """Compressed page text per PDF content digest, with LRU eviction.
+
+    Safe to open from several processes at once; SQLite serialises the
+    writes. Hit and miss counts (in pages) are added to the totals in the
+    file by flush() and close().
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES, variant: str = "") -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.variant = variant  # kept apart from other variants, e.g. another extraction backend
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._conn = sqlite3.connect(str(path), timeout=60)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+
+    def digest(self, pdf_path: str) -> str:
+        st = os.stat(pdf_path)
+        row = self._conn.execute("SELECT size, mtime_ns, digest FROM paths WHERE path = ?", (pdf_path,)).fetchone()
+        if row is not None and row[:2] == (st.st_size, st.st_mtime_ns):
+            return row[2]
+        digest = file_digest(pdf_path)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?)", (pdf_path, st.st_size, st.st_mtime_ns, digest)
+            )
+        return digest
+
+    def pages(self, pdf_path: str, extract: Extractor, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Return the text of pages [start, stop), extracting only on a miss."""
+        digest = self.digest(pdf_path)
+        if self.variant:
+            digest = f"{digest}:{self.variant}"
+        cached = self._load(digest, start, stop)
+        if cached is not None:
+            self.hits += len(cached)
+            return cached
+        page_count, texts = extract(pdf_path, start, stop)
+        self.misses += len(texts)
+        self._store(digest, page_count, start, texts)
+        return texts
+
+    def _load(self, digest: str, start: int, stop: Optional[int]) -> Optional[List[str]]:
+        row = self._conn.execute("SELECT page_count FROM docs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        stop = row[0] if stop is None else min(stop, row[0])
+        rows = self._conn.execute(
+            "SELECT text FROM pages WHERE digest = ? AND page >= ? AND page < ? ORDER BY page",
+            (digest, start, stop),
+        ).fetchall()
+        if len(rows) != max(stop - start, 0):
+            return None
+        with self._conn:
+            self._conn.execute("UPDATE docs SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        return [zlib.decompress(text).decode("utf-8", "surrogatepass") for (text,) in rows]
+
+    def _store(self, digest: str, page_count: int, start: int, texts: List[str]) -> None:
+        rows = []
+        for number, text in enumerate(texts, start):
+            raw = text.encode("utf-8", "surrogatepass")
+            rows.append((digest, number, zlib.compress(raw, COMPRESS_LEVEL), len(raw)))
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO docs VALUES (?, ?, 0, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET last_used = excluded.last_used",
+                (digest, page_count, time.time()),
+            )
+            # Another process may have stored some of these pages meanwhile.
+            self._conn.executemany("INSERT OR IGNORE INTO pages VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "UPDATE docs SET bytes = (SELECT SUM(LENGTH(text)) FROM pages WHERE digest = ?) WHERE digest = ?",
+                (digest, digest),
+            )
+        self._evict(keep=digest)
+
+    def _evict(self, keep: str) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM docs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self._conn:
+            for digest, size in self._conn.execute(
+                "SELECT digest, bytes FROM docs WHERE digest != ? ORDER BY last_used", (keep,)
+            ).fetchall():
+                self._conn.execute("DELETE FROM pages WHERE digest = ?", (digest,))
+                self._conn.execute("DELETE FROM docs WHERE digest = ?", (digest,))
+                self.evicted += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        docs, compressed = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM docs").fetchone()
+        pages, raw = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0) FROM pages").fetchone()
+        counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+        return {
+            "documents": docs,
+            "pages": pages,
+            "paths": self._conn.execute("SELECT COUNT(*) FROM paths").fetchone()[0],
+            "compressed_bytes": compressed,
+            "text_bytes": raw,
+            "file_bytes": os.path.getsize(self.path),
+            "page_hits": counters.get("page_hits", 0),
+            "page_misses": counters.get("page_misses", 0),
+            "evicted_documents": counters.get("evicted_documents", 0),
+        }
+
+    def clear(self) -> None:
+        with self._conn:
+            for table in ("docs", "pages", "paths", "counters"):
+                self._conn.execute(f"DELETE FROM {table}")
+        self._conn.execute("VACUUM")
+
+    def flush(self) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                [("page_hits", self.hits), ("page_misses", self.misses), ("evicted_documents", self.evicted)],
+            )
+        self.hits = self.misses = self.evicted = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inspect or clear the PDF page text cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("stats", "Print cache statistics"), ("clear", "Remove every cached page")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--cache", type=Path, default=DEFAULT_CACHE, help="Cache file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.cache.exists():
+        raise SystemExit(f"no cache at {args.cache}")
+    cache = PageTextCache(args.cache)
+    try:
+        if args.command == "clear":
+            cache.clear()
+            print(f"Cleared {args.cache}")
+            return
+        stats = cache.stats()
+    finally:
+        cache.close()
+    lookups = stats["page_hits"] + stats["page_misses"]
+    ratio = stats["text_bytes"] / stats["compressed_bytes"] if stats["compressed_bytes"] else 0.0
+    print(f"Documents:  {stats['documents']} ({stats['paths']} paths)")
+    print(f"Pages:      {stats['pages']}")
+    compressed = format_bytes(stats["compressed_bytes"])
+    print(f"Text:       {format_bytes(stats['text_bytes'])}, {compressed} compressed ({ratio:.1f}x)")
+    print(f"File size:  {format_bytes(stats['file_bytes'])}")
+    if lookups:
+        print(f"Hit rate:   {stats['page_hits'] / lookups:.1%} of {lookups} pages")
+    print(f"Evicted:    {stats['evicted_documents']} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Benchmark the file tools on a reproducible synthetic tree.
+
+Usage:
+  python benchmark.py --output results.json [--files N] [--dup-ratio F] [--sizes SPEC]
+      [--depth N] [--fanout N] [--empty-dirs N] [--seed N] [--workers N] [--repeat N]
+      [--case NAME ...] [--root DIR] [--keep-tree] [--compare baseline.json]
+
+Notes:
+  - The tree is generated from --seed, so the same options give the same tree
+    on every machine. --sizes is a weighted list of SIZE:WEIGHT pairs, e.g.
+    "4k:60,256k:30,8M:10"; each file gets a random size between half the
+    picked size and the full size. --dup-ratio is the fraction of files that
+    copy the content of an earlier file.
+  - Every case runs in a fresh interpreter so its peak RSS is its own (worker
+    processes of the process-pool cases are not included). The fastest of
+    --repeat runs is reported, together with files/s and MiB/s.
+  - Reading happens with a warm page cache after the first run; drop caches
+    between runs (or use --repeat 1 on a fresh tree) to measure cold reads.
+  - --root reuses a tree generated earlier with the same options, and
+    --keep-tree leaves a generated tree in place for the next run.
+  - --compare prints the time ratio against an earlier results file, so runs
+    from two commits can be compared directly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from patterns import parse_size
+from run_stats import MIB, peak_rss_kib
+
+
+PARAMS_FILE = ".bench-params.json"
+DEFAULT_SIZES = "4k:60,64k:25,1M:12,8M:3"
+
+
+def parse_sizes(spec: str) -> List[Tuple[int, float]]:
+    sizes = []
+    for item in spec.split(","):
+        size, _, weight = item.partition(":")
+        sizes.append((parse_size(size), float(weight or 1)))
+    return sizes
+
+
+def generate_tree(root: Path, params: Dict) -> None:
+    """Write params["files"] files under root, deterministically from params["seed"]."""
+    rng = random.Random(params["seed"])
+    sizes, weights = zip(*parse_sizes(params["sizes"]))
+    originals: List[bytes] = []
+    for index in range(params["files"]):
+        parts = [f"d{rng.randrange(params['fanout'])}" for _ in range(rng.randint(1, params["depth"]))]
+        directory = root.joinpath(*parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        if originals and rng.random() < params["dup_ratio"]:
+            data = rng.choice(originals)
+        else:
+            size = rng.choices(sizes, weights)[0]
+            data = rng.randbytes(rng.randint(size // 2, size))
+            # Keep a bounded pool of contents to copy from.
+            if len(originals) < 1024:
+                originals.append(data)
+            else:
+                originals[rng.randrange(len(originals))] = data
+        (directory / f"f{index}.bin").write_bytes(data)
+    for index in range(params["empty_dirs"]):
+        root.joinpath("empty", f"e{index}", *(f"n{level}" for level in range(params["depth"]))).mkdir(parents=True)
+    (root / PARAMS_FILE).write_text(json.dumps(params, sort_keys=True), encoding="utf-8")
+
+
+def tree_matches(root: Path, params: Dict) -> bool:
+    try:
+        return json.loads((root / PARAMS_FILE).read_text(encoding="utf-8")) == params
+    except (OSError, ValueError):
+        return False
+
+
+def run_case(case: str, root: Path, workers: int) -> Dict:
+    """Run one case in this process and return its measurements."""
+    from checksums import Schedule, build_checksum_index, build_staged_index
+    from remove_duplicates_shortest import remove_duplicates
+    from remove_empty_folders import find_empty_dirs
+    from walker import iter_files
+
+    if case == "remove_duplicates":
+        # Deletes from a scratch copy; the copy and the index are not timed.
+        scratch = Path(tempfile.mkdtemp(prefix="bench-rm-"))
+        try:
+            shutil.copytree(root, scratch / "tree")
+            staged, _ = build_staged_index(iter_files(scratch / "tree"), Schedule(workers))
+            start = time.perf_counter()
+            removed = remove_duplicates(staged, False, action_log=scratch / "actions.log")
+            seconds = time.perf_counter() - start
+        finally:
+            shutil.rmtree(scratch)
+        return {"seconds": seconds, "files": removed, "bytes": 0, "peak_rss_kib": peak_rss_kib()}
+
+    records = [record for record in iter_files(root) if not record.path.endswith(PARAMS_FILE)]
+
+    def index(backend: str, count: int) -> Callable[[], object]:
+        return lambda: build_checksum_index(records, Schedule(count, backend))
+
+    cases: Dict[str, Callable[[], object]] = {
+        "iter_files": lambda: sum(1 for _ in iter_files(root)),
+        "iter_files_threaded": lambda: sum(1 for _ in iter_files(root, threads=workers)),
+        "index_serial": index("process", 1),
+        "index_process": index("process", workers),
+        "index_thread": index("thread", workers),
+        "staged_index": lambda: build_staged_index(records, Schedule(workers)),
+        "find_empty_dirs": lambda: find_empty_dirs(root),
+    }
+    # The walks read no file contents, so they get no MiB/s figure.
+    walk_only = case in ("iter_files", "iter_files_threaded", "find_empty_dirs")
+    size = 0 if walk_only else sum(record.size for record in records)
+    start = time.perf_counter()
+    cases[case]()
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "files": len(records), "bytes": size, "peak_rss_kib": peak_rss_kib()}
+
+
+CASES = (
+    "iter_files",
+    "iter_files_threaded",
+    "index_serial",
+    "index_process",
+    "index_thread",
+    "staged_index",
+    "remove_duplicates",
+    "find_empty_dirs",
+)
+
+
+def measure(case: str, root: Path, workers: int, repeat: int) -> Dict:
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, __file__, "--run-case", case, "--root", str(root), "--workers", str(workers)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    best = min(runs, key=lambda run: run["seconds"])
+    seconds = max(best["seconds"], 1e-9)
+    return {
+        **best,
+        "runs_s": [run["seconds"] for run in runs],
+        "files_per_s": best["files"] / seconds,
+        "mib_per_s": best["bytes"] / MIB / seconds,
+        "peak_rss_kib": max(run["peak_rss_kib"] or 0 for run in runs),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_results(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    for case, result in results.items():
+        line = (
+            f"{case:>18}: {result['seconds']:8.3f}s  {result['files_per_s']:10.0f} files/s  "
+            f"{result['mib_per_s']:8.1f} MiB/s  {result['peak_rss_kib'] / 1024:7.1f} MiB RSS"
+        )
+        if case in baseline:
+            line += f"  x{result['seconds'] / max(baseline[case]['seconds'], 1e-9):.2f} time vs baseline"
+        print(line)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the file tools on a synthetic tree.")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--files", type=int, default=5000, help="Number of files to generate")
+    parser.add_argument("--dup-ratio", type=float, default=0.3, help="Fraction of files that duplicate another")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Weighted file sizes, SIZE:WEIGHT,...")
+    parser.add_argument("--depth", type=int, default=4, help="Maximum directory depth")
+    parser.add_argument("--fanout", type=int, default=8, help="Subdirectories per level")
+    parser.add_argument("--empty-dirs", type=int, default=100, help="Empty directory chains to create")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the tree")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="Workers and walk threads for parallel cases (0=cpu count)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    parser.add_argument("--case", action="append", choices=CASES, help="Case to run (repeatable, default all)")
+    parser.add_argument("--root", type=Path, help="Where to generate (or reuse) the tree")
+    parser.add_argument("--keep-tree", action="store_true", help="Do not delete a generated tree afterwards")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against")
+    parser.add_argument("--run-case", choices=CASES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    workers = args.workers or max(os.cpu_count() or 1, 1)
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.root, workers)))
+        return
+
+    params = {
+        "files": args.files,
+        "dup_ratio": args.dup_ratio,
+        "sizes": args.sizes,
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "empty_dirs": args.empty_dirs,
+        "seed": args.seed,
+    }
+    root = args.root or Path(tempfile.mkdtemp(prefix="bench-tree-"))
+    generated = False
+    if not tree_matches(root, params):
+        if root.exists() and any(root.iterdir()) and args.root is not None:
+            raise SystemExit(f"{root} is not empty and was not generated with these options")
+        print(f"Generating {args.files} files in {root}")
+        start = time.perf_counter()
+        generate_tree(root, params)
+        generated = True
+        print(f"Generated in {time.perf_counter() - start:.1f}s")
+
+    try:
+        results = {case: measure(case, root, workers, args.repeat) for case in args.case or CASES}
+    finally:
+        if generated and not args.keep_tree:
+            shutil.rmtree(root)
+
+    baseline = json.loads(args.compare.read_text(encoding="utf-8"))["results"] if args.compare else {}
+    print_results(results, baseline)
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": workers,
+            "params": params,
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
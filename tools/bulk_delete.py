@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Grouped, dir_fd-relative deletion with a replayable action log.
+
+The cleanup tools collect what they want to delete in a DeletePlan instead of
+removing paths one by one. Operations are grouped by parent directory, each
+directory is opened once and its entries are removed relative to that fd, and
+independent directories are processed in parallel.
+
+An action log stores a plan compactly: NUL-separated records, one "@<dir>"
+per parent followed by "U<name>" (unlink) or "R<name>" (rmdir) entries. An
+entry may be followed by "N<note>" and, for a duplicate, "K<kept path>".
+Parent and kept paths are written absolute.
+Tools write it with --action-log: as a plan with --dry-run, otherwise as the
+list of operations that succeeded.
+
+A duplicate is only unlinked while its kept copy still exists, so applying
+an old log cannot remove the last copy of a file.
+
+Usage:
+  python bulk_delete.py show plan.log
+  python bulk_delete.py apply plan.log [--workers N] [--action-log done.log]
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+UNLINK = "U"
+RMDIR = "R"
+NOTE = "N"
+KEPT = "K"
+DELETE_WORKERS = 8
+PRINT_CHUNK = 1024
+DIR_FD_SUPPORTED = os.unlink in os.supports_dir_fd and os.rmdir in os.supports_dir_fd
+
+
+class DeletePlan:
+    """Delete operations grouped by parent directory, in insertion order."""
+
+    def __init__(self) -> None:
+        # parent -> [(op, name, note, kept path or "")]
+        self.groups: Dict[str, List[Tuple[str, str, str, str]]] = {}
+        self._count = 0
+
+    def add(self, op: str, path: str, note: str = "", keep: str = "") -> None:
+        parent, name = os.path.split(os.fspath(path))
+        self.groups.setdefault(parent, []).append((op, name, note, keep))
+        self._count += 1
+
+    def unlink(self, path: str, note: str = "", keep: str = "") -> None:
+        """Plan to remove path; keep names the copy that must survive it, if any."""
+        self.add(UNLINK, path, note, keep)
+
+    def rmdir(self, path: str, note: str = "") -> None:
+        self.add(RMDIR, path, note)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def count(self, op: str) -> int:
+        return sum(1 for group in self.groups.values() for entry in group if entry[0] == op)
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str]]:
+        for op, path, note, _ in self.entries():
+            yield op, path, note
+
+    def entries(self) -> Iterator[Tuple[str, str, str, str]]:
+        """Yield (op, path, note, kept path or "")."""
+        for parent, ops in self.groups.items():
+            for op, name, note, keep in ops:
+                yield op, os.path.join(parent, name), note, keep
+
+    def write_log(self, path: Path) -> None:
+        # Paths are stored absolute so the log can be applied from any directory.
+        with open(path, "wb") as handle:
+            for parent, ops in self.groups.items():
+                records = [b"@" + os.fsencode(os.path.abspath(parent))]
+                for op, name, note, keep in ops:
+                    records.append(op.encode("ascii") + os.fsencode(name))
+                    if note:
+                        records.append(NOTE.encode("ascii") + os.fsencode(note))
+                    if keep:
+                        records.append(KEPT.encode("ascii") + os.fsencode(os.path.abspath(keep)))
+                handle.write(b"\0".join(records) + b"\0")
+
+    @classmethod
+    def read_log(cls, path: Path) -> "DeletePlan":
+        plan = cls()
+        parent = None
+        entry: Optional[List[str]] = None  # [op, path, note, keep] until the next entry starts
+
+        def flush() -> None:
+            if entry is not None:
+                plan.add(*entry)
+
+        for record in Path(path).read_bytes().split(b"\0"):
+            if not record:
+                continue
+            kind, value = record[:1].decode("ascii"), os.fsdecode(record[1:])
+            if kind == "@":
+                flush()
+                parent, entry = value, None
+            elif kind in (UNLINK, RMDIR) and parent is not None:
+                flush()
+                entry = [kind, os.path.join(parent, value), "", ""]
+            elif kind == NOTE and entry is not None:
+                entry[2] = value
+            elif kind == KEPT and entry is not None:
+                entry[3] = value
+            else:
+                raise ValueError(f"malformed action log: {path}")
+        flush()
+        return plan
+
+
+def apply_group(
+    parent: str, ops: List[Tuple[str, str, str, str]]
+) -> Tuple[DeletePlan, List[Tuple[str, OSError]]]:
+    done = DeletePlan()
+    errors: List[Tuple[str, OSError]] = []
+    dir_fd: Optional[int] = None
+    if DIR_FD_SUPPORTED:
+        try:
+            dir_fd = os.open(parent or ".", os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        except OSError as exc:
+            return done, [(os.path.join(parent, name), exc) for _, name, _, _ in ops]
+    try:
+        for op, name, note, keep in ops:
+            target = name if dir_fd is not None else os.path.join(parent, name)
+            try:
+                if keep:
+                    try:
+                        kept = os.stat(keep)
+                    except FileNotFoundError:
+                        raise FileNotFoundError(errno.ENOENT, "kept copy is gone, not removing its duplicate", keep)
+                    st = os.stat(target, dir_fd=dir_fd)
+                    if (st.st_dev, st.st_ino) == (kept.st_dev, kept.st_ino):
+                        # Same file through a link: removing it could take the kept copy with it.
+                        raise OSError(errno.EEXIST, "same file as the kept copy, not removing it", keep)
+                if op == UNLINK:
+                    os.unlink(target, dir_fd=dir_fd)
+                else:
+                    os.rmdir(target, dir_fd=dir_fd)
+            except OSError as exc:
+                errors.append((os.path.join(parent, name), exc))
+                continue
+            done.add(op, os.path.join(parent, name), note, keep)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return done, errors
+
+
+def apply_plan(plan: DeletePlan, workers: int = DELETE_WORKERS) -> Tuple[DeletePlan, List[Tuple[str, OSError]]]:
+    """Run a plan and return (operations that succeeded, failures).
+
+    Unlinks run first, one task per directory. Directory removals follow,
+    deepest parents first, so a directory emptied by earlier operations can
+    be removed in the same run.
+    """
+    unlinks: Dict[str, List[Tuple[str, str, str, str]]] = {}
+    rmdirs: Dict[int, Dict[str, List[Tuple[str, str, str, str]]]] = {}
+    for parent, ops in plan.groups.items():
+        for entry in ops:
+            if entry[0] == UNLINK:
+                unlinks.setdefault(parent, []).append(entry)
+            else:
+                depth = parent.count(os.sep)
+                rmdirs.setdefault(depth, {}).setdefault(parent, []).append(entry)
+
+    levels = [unlinks] + [rmdirs[depth] for depth in sorted(rmdirs, reverse=True)]
+    done = DeletePlan()
+    errors: List[Tuple[str, OSError]] = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for level in levels:
+            for group_done, group_errors in executor.map(lambda item: apply_group(*item), level.items()):
+                for op, path, note, keep in group_done.entries():
+                    done.add(op, path, note, keep)
+                errors.extend(group_errors)
+    return done, errors
+
+
+def describe(note: str, keep: str) -> str:
+    """Format the note and kept path of an entry as a suffix for its line."""
+    suffix = f" ({note})" if note else ""
+    if keep and keep not in note:
+        suffix += f" (kept {keep})"
+    return suffix
+
+
+def print_plan(plan: DeletePlan, prefix: str) -> None:
+    # Lines are written in chunks; per-line print() dominates on huge plans.
+    lines: List[str] = []
+    for _, path, note, keep in plan.entries():
+        lines.append(f"{prefix} {path}{describe(note, keep)}\n")
+        if len(lines) >= PRINT_CHUNK:
+            sys.stdout.write("".join(lines))
+            lines = []
+    sys.stdout.write("".join(lines))
+
+
+def execute_plan(
+    plan: DeletePlan, dry_run: bool, action_log: Optional[Path] = None, workers: int = DELETE_WORKERS
+) -> DeletePlan:
+    """Apply (or with dry_run, only report) a plan and return what was done.
+
+    With action_log the plan (dry run) or the completed operations are written
+    there instead of being printed.
+    """
+    if dry_run:
+        if action_log:
+            plan.write_log(action_log)
+        else:
+            print_plan(plan, "[dry-run] remove")
+        return plan
+
+    done, errors = apply_plan(plan, workers)
+    if action_log:
+        done.write_log(action_log)
+    else:
+        print_plan(done, "removed")
+    for path, exc in errors:
+        print(f"failed {path}: {exc}", file=sys.stderr)
+    return done
+
+
+def run_plan(
+    plan: DeletePlan, dry_run: bool, action_log: Optional[Path] = None, workers: int = DELETE_WORKERS
+) -> int:
+    return len(execute_plan(plan, dry_run, action_log, workers))
+
+
+def add_action_log_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--action-log",
+        type=Path,
+        help="Write the delete plan (with --dry-run) or the completed deletions here instead of printing them",
+    )
+
+
+def iter_plan_lines(plan: DeletePlan) -> Iterable[str]:
+    for op, path, note, keep in plan.entries():
+        yield f"{'rmdir' if op == RMDIR else 'unlink'} {path}{describe(note, keep)}\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Show or apply an action log written with --action-log.")
+    parser.add_argument("command", choices=("show", "apply"), help="Print the plan or carry it out")
+    parser.add_argument("log", type=Path, help="Action log to read")
+    parser.add_argument("--workers", type=int, default=DELETE_WORKERS, help="Directories processed in parallel")
+    parser.add_argument("--action-log", type=Path, help="Write the operations that succeeded here")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    plan = DeletePlan.read_log(args.log)
+    if args.command == "show":
+        sys.stdout.writelines(iter_plan_lines(plan))
+        print(f"{len(plan)} operations in {len(plan.groups)} directories.")
+        return
+
+    removed = run_plan(plan, False, args.action_log, args.workers)
+    print(f"Done. Applied {removed} of {len(plan)} operations.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,674 @@
+"""Checksum helpers shared by the duplicate removal tools.
+
+The index maps a hex digest to the list of paths with that content, either
+as a dict or, with compact=True, as an array-backed CompactIndex. Digests can
+be kept in an on-disk ChecksumCache so unchanged files are not re-read on the
+next run, and appended to a Journal so an interrupted run can be resumed.
+The hash functions are looked up by name in hashers.HASHERS; Schedule picks
+one for full checksums and a cheaper one for the partial-block prefilter.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from itertools import chain, islice
+from pathlib import Path
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from compact_index import CompactIndex
+from hashers import DEFAULT_HASHER, PREFILTER_HASHER, HASHERS, READ_SIZE
+from run_stats import RunStats, worker_id
+from walker import FileRecord
+
+
+PARTIAL_SIZE = 64 * 1024  # bytes read from each end of a file in the partial stage
+CACHE_FLUSH_EVERY = 1000
+BACKENDS = ("auto", "process", "thread")
+BATCH_FILES = 256
+BATCH_BYTES = 64 * 1024 * 1024  # 64 MiB
+MAX_PENDING_PER_WORKER = 4
+AUTO_SAMPLE_FILES = 1000
+# hashlib releases the GIL while hashing large buffers, so threads keep up once
+# files are big enough that per-file Python overhead stops dominating.
+THREAD_MIN_AVG_SIZE = READ_SIZE
+PREFETCH_CHUNKS = 64
+PREFETCH_CHUNK_SIZE = 256
+
+T = TypeVar("T")
+ChecksumIndex = Mapping[str, List[str]]
+
+
+@dataclass
+class StageStats:
+    name: str
+    files: int = 0
+    dropped: int = 0
+    bytes_skipped: int = 0
+
+
+class Prefetch(Generic[T]):
+    """Iterate over items produced by a background thread.
+
+    The producer (usually a directory walk) runs ahead of the consumer but
+    blocks once PREFETCH_CHUNKS chunks of PREFETCH_CHUNK_SIZE items are
+    waiting, so at most that many items are held in memory at a time.
+    With stats, the items are FileRecords and each is counted as a file
+    when the consumer takes it.
+    """
+
+    _DONE = object()
+
+    def __init__(self, items: Iterable[T], chunks: int = PREFETCH_CHUNKS, stats: Optional[RunStats] = None) -> None:
+        self._items = items
+        self._queue: queue.Queue = queue.Queue(maxsize=chunks)
+        self._error: Optional[BaseException] = None
+        self._stats = stats
+        if stats is not None:
+            stats.queue_depth = lambda: self.depth
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self) -> None:
+        chunk: List[T] = []
+        start = time.perf_counter()
+        try:
+            for item in self._items:
+                chunk.append(item)
+                if len(chunk) >= PREFETCH_CHUNK_SIZE:
+                    self._queue.put(chunk)
+                    chunk = []
+        except BaseException as exc:  # re-raised in the consumer
+            self._error = exc
+        if self._stats is not None:
+            self._stats.add_phase("walk", time.perf_counter() - start)
+        if chunk:
+            self._queue.put(chunk)
+        self._queue.put(self._DONE)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            chunk = self._queue.get()
+            if chunk is self._DONE:
+                break
+            if self._stats is not None:
+                self._stats.record_files(len(chunk), sum(max(record.size, 0) for record in chunk))
+            yield from chunk
+        if self._error is not None:
+            raise self._error
+
+
+@dataclass
+class Schedule:
+    """How checksum jobs are spread over workers, and where their timings go."""
+
+    workers: int
+    backend: str = "auto"
+    batch_files: int = BATCH_FILES
+    batch_bytes: int = BATCH_BYTES
+    stats: Optional[RunStats] = None
+    hasher: str = DEFAULT_HASHER  # full checksums; must be a strong hasher
+    prefilter: str = PREFILTER_HASHER  # partial (head and tail) checksums
+    read_size: int = READ_SIZE
+
+    def resolve_backend(self, sizes: Iterable[int]) -> str:
+        if self.backend != "auto":
+            return self.backend
+        sizes = list(sizes)
+        if sizes and sum(sizes) / len(sizes) >= THREAD_MIN_AVG_SIZE:
+            return "thread"
+        return "process"
+
+
+class ChecksumCache:
+    """SQLite store of digests keyed on (device, inode).
+
+    An entry is only used while the file's size and mtime still match the
+    values recorded when it was hashed; anything else counts as a miss and is
+    overwritten on the next store. Each hasher gets its own table.
+    """
+
+    def __init__(self, path: Path, hasher: str = DEFAULT_HASHER) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._pending: List[Tuple[int, int, int, int, str]] = []
+        self._table = "checksums" if hasher == DEFAULT_HASHER else "checksums_" + re.sub(r"\W", "_", hasher)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} ("
+            " dev INTEGER NOT NULL, ino INTEGER NOT NULL,"
+            " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " digest TEXT NOT NULL, PRIMARY KEY (dev, ino))"
+        )
+
+    def lookup(self, record: FileRecord) -> Optional[str]:
+        row = self._conn.execute(
+            f"SELECT size, mtime_ns, digest FROM {self._table} WHERE dev = ? AND ino = ?",
+            (record.dev, record.inode),
+        ).fetchone()
+        if row is not None and row[0] == record.size and row[1] == record.mtime_ns:
+            self.hits += 1
+            return row[2]
+        self.misses += 1
+        return None
+
+    def store(self, record: FileRecord, digest: str) -> None:
+        self._pending.append((record.dev, record.inode, record.size, record.mtime_ns, digest))
+        if len(self._pending) >= CACHE_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self._table} VALUES (?, ?, ?, ?, ?)", self._pending)
+            self._conn.commit()
+            self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> "ChecksumCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Journal:
+    """Append-only JSON-lines log of finished full checksums.
+
+    Each line is {"path", "size", "mtime_ns", "digest", "hasher"}. With
+    resume=True the existing lines are loaded first and a path is only reused
+    while its size and mtime still match and it was hashed with the same
+    hasher; a last line cut short by a crash is dropped. Without resume the
+    journal starts empty.
+    """
+
+    def __init__(self, path: Path, resume: bool = False, hasher: str = DEFAULT_HASHER) -> None:
+        self.path = path
+        self.hasher = hasher
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[int, int, str]] = {}
+        self._pending = 0
+        if resume and path.exists():
+            self._load()
+        self._handle = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self) -> None:
+        valid = 0
+        with open(self.path, "rb") as handle:
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                valid += len(line)
+                try:
+                    entry = json.loads(line)
+                    if entry.get("hasher", DEFAULT_HASHER) == self.hasher:
+                        self._entries[entry["path"]] = (entry["size"], entry["mtime_ns"], entry["digest"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        # Cut a partial last line so new records start on a line of their own.
+        os.truncate(self.path, valid)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, record: FileRecord) -> Optional[str]:
+        entry = self._entries.get(record.path)
+        if entry is not None and entry[0] == record.size and entry[1] == record.mtime_ns:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def store(self, record: FileRecord, digest: str) -> None:
+        line = {
+            "path": record.path,
+            "size": record.size,
+            "mtime_ns": record.mtime_ns,
+            "digest": digest,
+            "hasher": self.hasher,
+        }
+        self._handle.write(json.dumps(line) + "\n")
+        self._pending += 1
+        if self._pending >= CACHE_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._handle.close()
+
+
+class DigestStore(Protocol):
+    hits: int
+    misses: int
+
+    def lookup(self, record: FileRecord) -> Optional[str]: ...
+
+    def store(self, record: FileRecord, digest: str) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class DigestStores:
+    """Several digest stores used as one: the first hit wins, stores go to all."""
+
+    def __init__(self, stores: Sequence[DigestStore]) -> None:
+        self.stores = list(stores)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, record: FileRecord) -> Optional[str]:
+        for store in self.stores:
+            digest = store.lookup(record)
+            if digest is not None:
+                self.hits += 1
+                return digest
+        self.misses += 1
+        return None
+
+    def store(self, record: FileRecord, digest: str) -> None:
+        for store in self.stores:
+            store.store(record, digest)
+
+    def flush(self) -> None:
+        for store in self.stores:
+            store.flush()
+
+    def close(self) -> None:
+        for store in self.stores:
+            store.close()
+
+
+def add_worker_args(parser: argparse.ArgumentParser) -> None:
+    """Add --workers, --backend, --batch-files and --batch-bytes (see Schedule)."""
+    parser.add_argument("--workers", type=int, default=0, help="Workers (0=auto, 1=single process)")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="auto",
+        help="Worker pool type (auto picks threads when the average file is large)",
+    )
+    parser.add_argument("--batch-files", type=int, default=BATCH_FILES, help="Max files per worker task")
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES, help="Max bytes per worker task")
+
+
+def add_cache_args(parser: argparse.ArgumentParser) -> None:
+    """Add --cache, --journal and --resume (see open_digest_store)."""
+    parser.add_argument("--cache", type=Path, help="SQLite checksum cache to read and update")
+    parser.add_argument("--journal", type=Path, help="Append finished checksums to this JSON-lines journal")
+    parser.add_argument("--resume", action="store_true", help="Reuse the checksums already in --journal")
+
+
+def open_digest_store(
+    cache: Optional[Path], journal: Optional[Path] = None, resume: bool = False, hasher: str = DEFAULT_HASHER
+) -> Optional[DigestStore]:
+    """Open the --journal and --cache stores requested on the command line.
+
+    The journal is consulted first, since it holds the digests of the run
+    being resumed.
+    """
+    if resume and journal is None:
+        raise SystemExit("--resume needs --journal")
+    stores: List[DigestStore] = []
+    if journal is not None:
+        stores.append(Journal(journal, resume, hasher))
+    if cache is not None:
+        stores.append(ChecksumCache(cache, hasher))
+    if len(stores) > 1:
+        return DigestStores(stores)
+    return stores[0] if stores else None
+
+
+_buffers = threading.local()
+
+
+def read_buffer(size: int) -> memoryview:
+    """A buffer of the given size, reused by every read on this thread."""
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != size:
+        buffer = _buffers.buffer = bytearray(size)
+    return memoryview(buffer)
+
+
+def file_checksum(path: str, hasher: str = DEFAULT_HASHER, read_size: int = READ_SIZE) -> Tuple[str, str]:
+    digest = HASHERS[hasher].new()
+    buffer = read_buffer(read_size)
+    # Unbuffered reads straight into the reused buffer: no per-chunk bytes objects.
+    with open(path, "rb", buffering=0) as handle:
+        while True:
+            count = handle.readinto(buffer)
+            if not count:
+                break
+            digest.update(buffer[:count])
+    return digest.hexdigest(), path
+
+
+def partial_checksum(path: str, size: int, hasher: str = PREFILTER_HASHER) -> Tuple[str, str]:
+    # Hash the first and last blocks only; cheap way to split same-size files.
+    digest = HASHERS[hasher].new()
+    buffer = read_buffer(PARTIAL_SIZE)
+    with open(path, "rb", buffering=0) as handle:
+        digest.update(buffer[: handle.readinto(buffer)])
+        if size > PARTIAL_SIZE:
+            handle.seek(max(size - PARTIAL_SIZE, PARTIAL_SIZE))
+            digest.update(buffer[: handle.readinto(buffer)])
+    return digest.hexdigest(), path
+
+
+def partial_read_size(size: int) -> int:
+    return min(size, 2 * PARTIAL_SIZE)
+
+
+def checksum_batch(
+    func: Callable[..., Tuple[str, str]], batch: List[Tuple[Tuple, int]]
+) -> List[Tuple[str, str, int, str, float]]:
+    # Returns (digest, path, size, worker, seconds) so the caller can record timings.
+    worker = worker_id()
+    results = []
+    for args, size in batch:
+        start = time.perf_counter()
+        digest, name = func(*args)
+        results.append((digest, name, size, worker, time.perf_counter() - start))
+    return results
+
+
+def iter_batches(
+    jobs: Iterable[Tuple[Tuple, int]], batch_files: int, batch_bytes: int
+) -> Iterator[List[Tuple[Tuple, int]]]:
+    # A batch closes at batch_files entries or once it holds batch_bytes of data.
+    batch: List[Tuple[Tuple, int]] = []
+    batch_size = 0
+    for job in jobs:
+        batch.append(job)
+        batch_size += job[1]
+        if len(batch) >= batch_files or batch_size >= batch_bytes:
+            yield batch
+            batch = []
+            batch_size = 0
+    if batch:
+        yield batch
+
+
+def iter_checksums(
+    func: Callable[..., Tuple[str, str]], jobs: Iterable[Tuple[Tuple, int]], schedule: Schedule
+) -> Iterator[Tuple[str, str]]:
+    """Run func over jobs of (args, size) and yield results as batches finish.
+
+    At most MAX_PENDING_PER_WORKER batches per worker are in flight, so memory
+    stays bounded no matter how many jobs there are.
+    """
+    stats = schedule.stats
+
+    def unpack(results: List[Tuple[str, str, int, str, float]]) -> Iterator[Tuple[str, str]]:
+        for digest, name, size, worker, seconds in results:
+            if stats is not None:
+                stats.record_hash(worker, size, seconds)
+            yield digest, name
+
+    if schedule.workers <= 1:
+        for job in jobs:
+            yield from unpack(checksum_batch(func, [job]))
+        return
+
+    jobs = iter(jobs)
+    sample = list(islice(jobs, AUTO_SAMPLE_FILES))
+    backend = schedule.resolve_backend(size for _, size in sample)
+    executor_cls = ThreadPoolExecutor if backend == "thread" else ProcessPoolExecutor
+    max_pending = schedule.workers * MAX_PENDING_PER_WORKER
+
+    if stats is not None:
+        stats.workers = schedule.workers
+
+    with executor_cls(max_workers=schedule.workers) as executor:
+        pending = set()
+        for batch in iter_batches(chain(sample, jobs), schedule.batch_files, schedule.batch_bytes):
+            pending.add(executor.submit(checksum_batch, func, batch))
+            # An estimate: a batch in flight may still be queued in the pool.
+            if stats is not None:
+                stats.busy_estimate = min(len(pending), schedule.workers)
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from unpack(future.result())
+        for future in as_completed(pending):
+            pending.discard(future)
+            if stats is not None:
+                stats.busy_estimate = min(len(pending) + 1, schedule.workers)
+            yield from unpack(future.result())
+        if stats is not None:
+            stats.busy_estimate = 0
+
+
+def cached_file_checksums(
+    records: Iterable[FileRecord], schedule: Schedule, cache: Optional[DigestStore] = None
+) -> Iterator[Tuple[str, str]]:
+    """Yield (digest, path) for every record, reading only files missing from cache.
+
+    Cache lookups and stores happen in the calling process; workers only see
+    the files that actually need hashing.
+    """
+    misses: Dict[str, FileRecord] = {}
+
+    def iter_jobs() -> Iterator[Tuple[Tuple, int]]:
+        for record in records:
+            if cache is not None:
+                digest = cache.lookup(record)
+                if digest is not None:
+                    hits.append((digest, record.path))
+                    continue
+                misses[record.path] = record
+            yield (record.path, schedule.hasher, schedule.read_size), record.size
+
+    hits: List[Tuple[str, str]] = []
+    for digest, name in iter_checksums(file_checksum, iter_jobs(), schedule):
+        if cache is not None:
+            cache.store(misses.pop(name), digest)
+        yield digest, name
+        if hits:
+            yield from hits
+            hits.clear()
+    yield from hits
+    if cache is not None:
+        cache.flush()
+
+
+def build_checksum_index(
+    records: Iterable[FileRecord], schedule: Schedule, cache: Optional[DigestStore] = None, compact: bool = False
+) -> ChecksumIndex:
+    index: Union[Dict[str, List[str]], CompactIndex] = CompactIndex() if compact else {}
+    with timed(schedule, "hash"):
+        for digest, name in cached_file_checksums(records, schedule, cache):
+            if isinstance(index, CompactIndex):
+                index.add(digest, name)
+            else:
+                index.setdefault(digest, []).append(name)
+    if isinstance(index, CompactIndex):
+        with timed(schedule, "grouping"):
+            index.finalize()
+    return index
+
+
+def group_by_size(
+    records: Iterable[FileRecord], stats: StageStats, keep_records: bool = True
+) -> Dict[int, List[Union[FileRecord, str]]]:
+    """Group records by size and drop sizes seen once.
+
+    With keep_records=False only the paths are kept, which is most of the
+    memory of this stage on trees with many files.
+    """
+    groups: Dict[int, List[Union[FileRecord, str]]] = {}
+    for record in records:
+        groups.setdefault(record.size, []).append(record if keep_records else record.path)
+        stats.files += 1
+    for size in [size for size, group in groups.items() if len(group) == 1]:
+        del groups[size]
+        stats.dropped += 1
+        stats.bytes_skipped += size
+    return groups
+
+
+def build_staged_index(
+    records: Iterable[FileRecord], schedule: Schedule, cache: Optional[DigestStore] = None, compact: bool = False
+) -> Tuple[ChecksumIndex, List[StageStats]]:
+    """Index duplicate candidates by size, then partial hash, then full hash.
+
+    Only files that still share a size and partial hash with another file are
+    read in full. The returned index holds the same duplicate sets that
+    build_checksum_index would produce; files proven unique are left out.
+    Size groups whose members are all in the cache skip the partial stage.
+    With compact=True full digests go straight into a CompactIndex.
+
+    Each stage consumes the groups of the one before it as it goes, so only
+    one stage's bookkeeping is alive at a time. Full records are only held
+    when there is a cache to store digests in.
+    """
+    size_stats = StageStats("size")
+    partial_stats = StageStats("partial")
+    full_stats = StageStats("full")
+
+    compact_index = CompactIndex() if compact else None
+    full_index: Dict[str, List[str]] = {}
+    cached: Dict[str, str] = {}
+    to_store: Dict[str, FileRecord] = {}  # records to store in the cache once hashed
+
+    def add(digest: str, name: str) -> None:
+        if compact_index is not None:
+            compact_index.add(digest, name)
+        else:
+            full_index.setdefault(digest, []).append(name)
+
+    with timed(schedule, "size grouping"):
+        size_groups = group_by_size(records, size_stats, keep_records=cache is not None)
+    sizes: Dict[str, int] = {}
+
+    def partial_jobs() -> Iterator[Tuple[Tuple, int]]:
+        while size_groups:
+            size, group = size_groups.popitem()
+            if cache is not None:
+                digests = [cache.lookup(record) for record in group]
+                if all(digest is not None for digest in digests):
+                    for digest, record in zip(digests, group):
+                        add(digest, record.path)
+                    full_stats.files += len(group)
+                    continue
+                for digest, record in zip(digests, group):
+                    if digest is not None:
+                        cached[record.path] = digest
+                    else:
+                        to_store[record.path] = record
+            for entry in group:
+                name = entry if isinstance(entry, str) else entry.path
+                sizes[name] = size
+                yield (name, size, schedule.prefilter), partial_read_size(size)
+
+    # size -> partial digest -> the path, or a list once a second path shares it
+    partial_groups: Dict[int, Dict[str, Union[str, List[str]]]] = {}
+    with timed(schedule, "partial hash"):
+        for digest, name in iter_checksums(partial_checksum, partial_jobs(), schedule):
+            group = partial_groups.setdefault(sizes.pop(name), {})
+            names = group.get(digest)
+            if names is None:
+                group[digest] = name
+            elif isinstance(names, str):
+                group[digest] = [names, name]
+            else:
+                names.append(name)
+            partial_stats.files += 1
+    del sizes
+
+    def hash_jobs() -> Iterator[Tuple[Tuple, int]]:
+        while partial_groups:
+            size, group = partial_groups.popitem()
+            while group:
+                _, names = group.popitem()
+                if isinstance(names, str):
+                    partial_stats.dropped += 1
+                    partial_stats.bytes_skipped += size - partial_read_size(size)
+                    to_store.pop(names, None)
+                    continue
+                for name in names:
+                    full_stats.files += 1
+                    if name in cached:
+                        add(cached.pop(name), name)
+                    else:
+                        yield (name, schedule.hasher, schedule.read_size), size
+
+    with timed(schedule, "full hash"):
+        for digest, name in iter_checksums(file_checksum, hash_jobs(), schedule):
+            add(digest, name)
+            if cache is not None:
+                cache.store(to_store.pop(name), digest)
+    if cache is not None:
+        cache.flush()
+
+    if compact_index is not None:
+        with timed(schedule, "grouping"):
+            full_stats.dropped += compact_index.finalize(min_group=2)
+        return compact_index, [size_stats, partial_stats, full_stats]
+
+    index: Dict[str, List[str]] = {}
+    for digest, names in full_index.items():
+        if len(names) == 1:
+            full_stats.dropped += 1
+            continue
+        index[digest] = names
+    return index, [size_stats, partial_stats, full_stats]
+
+
+def timed(schedule: Schedule, phase: str) -> ContextManager[None]:
+    return schedule.stats.phase(phase) if schedule.stats is not None else nullcontext()
+
+
+def print_stage_stats(stages: List[StageStats]) -> None:
+    for stage in stages:
+        print(
+            f"  {stage.name:>7}: {stage.files} files checked, {stage.dropped} ruled out, "
+            f"{stage.bytes_skipped} bytes not read"
+        )
+
+
+def print_cache_stats(cache: Optional[DigestStore]) -> None:
+    for store in getattr(cache, "stores", [cache]):
+        if isinstance(store, Journal):
+            print(f"Journal {store.path}: {store.hits} resumed, {store.misses} to hash")
+        elif store is not None:
+            print(f"Cache {store.path}: {store.hits} hits, {store.misses} misses")
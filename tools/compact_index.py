@@ -0,0 +1,148 @@
+"""Array-backed checksum index for trees with tens of millions of files.
+
+A Dict[str, List[str]] index costs well over 100 bytes per file in Python
+objects. CompactIndex stores each digest as fixed-width bytes in one
+bytearray and each path as a (directory id, basename) pair, with the
+directory strings interned in a shared table and the basenames packed into a
+second bytearray. Entries are grouped by sorting their ids on the digest, so
+no per-digest list exists until a group is read back.
+
+CompactIndex is a read-only Mapping from hex digest to the list of paths, so
+it can be passed wherever the dict index is accepted.
+"""
+
+from __future__ import annotations
+
+import os
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Mapping, Sequence, Tuple
+
+
+BUCKET_BITS = 8  # entries are sorted per leading digest byte to bound temporary memory
+
+
+class PathTable:
+    """Paths interned as (directory id, basename)."""
+
+    def __init__(self) -> None:
+        self.dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_of = array("I")
+        self._names = bytearray()
+        self._offsets = array("Q", [0])
+
+    def add(self, path: str) -> int:
+        parent, name = os.path.split(path)
+        dir_id = self._dir_ids.get(parent)
+        if dir_id is None:
+            dir_id = self._dir_ids[parent] = len(self.dirs)
+            self.dirs.append(parent)
+        self._dir_of.append(dir_id)
+        self._names += os.fsencode(name)
+        self._offsets.append(len(self._names))
+        return len(self._dir_of) - 1
+
+    def __len__(self) -> int:
+        return len(self._dir_of)
+
+    def __getitem__(self, entry: int) -> str:
+        name = os.fsdecode(bytes(self._names[self._offsets[entry] : self._offsets[entry + 1]]))
+        return os.path.join(self.dirs[self._dir_of[entry]], name)
+
+
+class GroupDigests(Sequence[bytes]):
+    """The sorted group digests of a CompactIndex, as a sequence for bisect.
+
+    bisect only gained key= in Python 3.10; this view works on older versions
+    without copying the digests out.
+    """
+
+    def __init__(self, index: "CompactIndex") -> None:
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, group: int) -> bytes:  # type: ignore[override]
+        return self._index._group_digest(group)
+
+
+class CompactIndex(Mapping[str, List[str]]):
+    """Digest -> paths index built with add() and grouped once by finalize()."""
+
+    def __init__(self) -> None:
+        self.digest_size = 0  # taken from the first digest added
+        self.paths = PathTable()
+        self._digests = bytearray()
+        self._order = array("I")  # entry ids sorted by digest, grouped
+        self._starts = array("I", [0])  # group boundaries in _order
+        self._finalized = False
+
+    def add(self, digest: str, path: str) -> None:
+        if self._finalized:
+            raise RuntimeError("CompactIndex is read-only after finalize()")
+        raw = bytes.fromhex(digest)
+        if not self.digest_size:
+            self.digest_size = len(raw)
+        if len(raw) != self.digest_size:
+            raise ValueError(f"expected a {self.digest_size}-byte digest, got {len(raw)} bytes")
+        self._digests += raw
+        self.paths.add(path)
+
+    def _digest_at(self, entry: int) -> bytes:
+        return bytes(self._digests[entry * self.digest_size : (entry + 1) * self.digest_size])
+
+    def finalize(self, min_group: int = 1) -> int:
+        """Sort entries into groups, keep those with at least min_group paths.
+
+        Returns the number of entries dropped from smaller groups.
+        """
+        buckets = [array("I") for _ in range(1 << BUCKET_BITS)]
+        for entry in range(len(self.paths)):
+            buckets[self._digests[entry * self.digest_size]].append(entry)
+        dropped = 0
+        for bucket in buckets:
+            entries = sorted(bucket, key=self._digest_at)
+            start = 0
+            while start < len(entries):
+                digest = self._digest_at(entries[start])
+                end = start + 1
+                while end < len(entries) and self._digest_at(entries[end]) == digest:
+                    end += 1
+                if end - start >= min_group:
+                    self._order.extend(entries[start:end])
+                    self._starts.append(len(self._order))
+                else:
+                    dropped += end - start
+                start = end
+        self._finalized = True
+        return dropped
+
+    def _group(self, group: int) -> List[str]:
+        return [self.paths[entry] for entry in self._order[self._starts[group] : self._starts[group + 1]]]
+
+    def _group_digest(self, group: int) -> bytes:
+        return self._digest_at(self._order[self._starts[group]])
+
+    def __len__(self) -> int:
+        return len(self._starts) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        for group in range(len(self)):
+            yield self._group_digest(group).hex()
+
+    def __getitem__(self, digest: str) -> List[str]:
+        raw = bytes.fromhex(digest)
+        group = bisect_left(GroupDigests(self), raw)
+        if group == len(self) or self._group_digest(group) != raw:
+            raise KeyError(digest)
+        return self._group(group)
+
+    def values(self) -> Iterator[List[str]]:  # type: ignore[override]
+        for group in range(len(self)):
+            yield self._group(group)
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:  # type: ignore[override]
+        for group in range(len(self)):
+            yield self._group_digest(group).hex(), self._group(group)
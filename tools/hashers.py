@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Named hash functions for the dedup tools, and a micro-benchmark of them.
+
+  blake2b-16   default; cryptographic, standard library
+  sha256       cryptographic, standard library (SHA-NI accelerated on many CPUs)
+  crc32        zlib, 32 bits; prefilter only
+  adler32      zlib, 32 bits; prefilter only
+  xxh64        needs the xxhash package; prefilter only
+  xxh3-128     needs the xxhash package
+  blake3       needs the blake3 package
+
+Only "strong" hashers may be used to decide that two files are identical
+(--hasher). Any hasher can be a prefilter (--prefilter), whose digests only
+decide which files are worth a strong hash. The dedup tools take both flags,
+plus --read-size for the per-file read buffer, via add_hasher_args().
+
+Usage:
+  python hashers.py [--size 256M] [--read-size 1M]
+
+Notes:
+  - Prints MiB/s per available hasher, hashing an in-memory buffer in
+    --read-size chunks, so the figures exclude disk speed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+from patterns import parse_size
+
+try:
+    import xxhash
+except ImportError:  # optional accelerated backend
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:  # optional accelerated backend
+    blake3 = None
+
+
+DEFAULT_HASHER = "blake2b-16"
+PREFILTER_HASHER = "crc32"
+MIB = 1024 * 1024
+READ_SIZE = MIB  # default per-file read buffer
+
+
+class ZlibHasher:
+    """hashlib-style wrapper around zlib.crc32 / zlib.adler32."""
+
+    def __init__(self, func: Callable[..., int]) -> None:
+        self._func = func
+        self._value = func(b"")
+
+    def update(self, data: Any) -> None:
+        self._value = self._func(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+@dataclass(frozen=True)
+class HasherInfo:
+    name: str
+    new: Callable[[], Any]  # returns an object with update() and hexdigest()
+    strong: bool  # collisions are negligible, so equal digests mean equal content
+    digest_size: int  # bytes
+
+
+HASHERS: Dict[str, HasherInfo] = {}
+
+
+def register(name: str, new: Callable[[], Any], strong: bool, digest_size: int) -> None:
+    HASHERS[name] = HasherInfo(name, new, strong, digest_size)
+
+
+register("blake2b-16", lambda: hashlib.blake2b(digest_size=16), True, 16)
+register("sha256", hashlib.sha256, True, 32)
+register("crc32", lambda: ZlibHasher(zlib.crc32), False, 4)
+register("adler32", lambda: ZlibHasher(zlib.adler32), False, 4)
+if xxhash is not None:
+    register("xxh64", xxhash.xxh64, False, 8)
+    register("xxh3-128", xxhash.xxh3_128, True, 16)
+if blake3 is not None:
+    register("blake3", blake3.blake3, True, 32)
+
+
+def get_hasher(name: str, strong: bool = False) -> HasherInfo:
+    """Look a hasher up by name; with strong=True refuse prefilter-only ones."""
+    info = HASHERS.get(name)
+    if info is None:
+        raise ValueError(f"unknown or unavailable hasher {name!r} (choose from {', '.join(HASHERS)})")
+    if strong and not info.strong:
+        raise ValueError(f"{name} is too weak to prove files identical; use it as --prefilter")
+    return info
+
+
+def strong_hasher_arg(name: str) -> str:
+    """argparse type for --hasher."""
+    try:
+        return get_hasher(name, strong=True).name
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def hasher_arg(name: str) -> str:
+    """argparse type for --prefilter."""
+    try:
+        return get_hasher(name).name
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def add_hasher_args(parser: argparse.ArgumentParser, prefilter: bool = True) -> None:
+    """Add --hasher, --prefilter (unless prefilter=False) and --read-size."""
+    parser.add_argument(
+        "--hasher",
+        type=strong_hasher_arg,
+        default=DEFAULT_HASHER,
+        help="Hash function for full checksums (see hashers.py)",
+    )
+    if prefilter:
+        parser.add_argument(
+            "--prefilter",
+            type=hasher_arg,
+            default=PREFILTER_HASHER,
+            help="Hash function for the partial (first and last block) checksums",
+        )
+    parser.add_argument("--read-size", type=parse_size, default=READ_SIZE, help="Read buffer size (e.g. 4M)")
+
+
+def benchmark(size: int, read_size: int) -> Dict[str, float]:
+    """Return MiB/s per hasher over size bytes of random data."""
+    data = memoryview(os.urandom(min(size, read_size)))
+    chunks = max(size // len(data), 1)
+    results = {}
+    for name, info in HASHERS.items():
+        hasher = info.new()
+        start = time.perf_counter()
+        for _ in range(chunks):
+            hasher.update(data)
+        hasher.hexdigest()
+        results[name] = chunks * len(data) / MIB / max(time.perf_counter() - start, 1e-9)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure hashing speed of the available hashers.")
+    parser.add_argument("--size", type=parse_size, default=256 * MIB, help="Bytes to hash per hasher (e.g. 1G)")
+    parser.add_argument("--read-size", type=parse_size, default=READ_SIZE, help="Chunk size passed to update()")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    for name, speed in sorted(benchmark(args.size, args.read_size).items(), key=lambda item: -item[1]):
+        kind = "strong" if HASHERS[name].strong else "prefilter"
+        print(f"{name:>10}  {speed:9.1f} MiB/s  ({kind})")
+    missing = [name for name, module in (("xxhash", xxhash), ("blake3", blake3)) if module is None]
+    if missing:
+        print(f"Not installed: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Perceptual image hashes and a multi-index table for Hamming-radius lookups.
+
+Each hash is a 64-bit integer computed from a small grayscale thumbnail, so
+resized or re-encoded copies of a photo land within a few bits of each other:
+
+  ahash   8x8 thumbnail, bit set where a pixel is brighter than the mean
+  dhash   9x8 thumbnail, bit set where a pixel is brighter than its right neighbour
+  phash   32x32 thumbnail, bit set where a low-frequency DCT coefficient is
+          above the median (most robust, slowest)
+
+Pillow is an optional dependency (pip install -r tools/requirements.txt);
+importing this module works without it, hashing does not.
+"""
+
+from __future__ import annotations
+
+import math
+from itertools import combinations
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+
+HASH_BITS = 64
+PHASH_SIZE = 32
+PHASH_LOW = 8  # low-frequency coefficients kept per axis
+# cos((2x + 1) * u * pi / 64) for the first PHASH_LOW frequencies
+DCT_COS = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)] for u in range(PHASH_LOW)
+]
+
+
+def require_pillow() -> None:
+    if Image is None:
+        raise SystemExit("Pillow is required for image hashing: pip install -r tools/requirements.txt")
+
+
+def thumbnail(path: str, width: int, height: int) -> List[List[int]]:
+    """Return rows of grayscale pixel values for a width x height thumbnail."""
+    with Image.open(path) as image:
+        # Lets the JPEG decoder downscale while decoding, which is far cheaper.
+        image.draft("L", (width * 4, height * 4))
+        data = image.convert("L").resize((width, height), Image.Resampling.LANCZOS).tobytes()
+    return [list(data[row * width : (row + 1) * width]) for row in range(height)]
+
+
+def to_int(bits: List[bool]) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+
+def ahash(path: str) -> int:
+    pixels = [value for row in thumbnail(path, 8, 8) for value in row]
+    mean = sum(pixels) / len(pixels)
+    return to_int([value > mean for value in pixels])
+
+
+def dhash(path: str) -> int:
+    rows = thumbnail(path, 9, 8)
+    return to_int([row[x] > row[x + 1] for row in rows for x in range(8)])
+
+
+def phash(path: str) -> int:
+    rows = thumbnail(path, PHASH_SIZE, PHASH_SIZE)
+    # Separable 2-D DCT-II, computing only the PHASH_LOW x PHASH_LOW corner.
+    by_row = [[sum(value * cos for value, cos in zip(row, DCT_COS[u])) for u in range(PHASH_LOW)] for row in rows]
+    coefficients = [
+        sum(by_row[y][u] * DCT_COS[v][y] for y in range(PHASH_SIZE)) for v in range(PHASH_LOW) for u in range(PHASH_LOW)
+    ]
+    # The DC term only reflects overall brightness; leave it out of the median.
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    return to_int([value > median for value in coefficients])
+
+
+HASHES: Dict[str, Callable[[str], int]] = {"ahash": ahash, "dhash": dhash, "phash": phash}
+
+
+def image_hash(path: str, algorithm: str) -> Tuple[str, str]:
+    """Return (hex hash, path), or ("", path) when the image cannot be decoded.
+
+    Shaped like checksums.file_checksum so it can run through iter_checksums.
+    """
+    try:
+        value = HASHES[algorithm](path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return "", path
+    return f"{value:0{HASH_BITS // 4}x}", path
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def ball_size(bits: int, radius: int) -> int:
+    """Number of bit patterns of the given width within radius of a fixed one."""
+    return sum(math.comb(bits, flipped) for flipped in range(radius + 1))
+
+
+class MultiIndexHash:
+    """Hamming-radius index over integer hashes (multi-index hashing).
+
+    Hashes are split into m chunks, each with its own table. If two hashes are
+    within radius bits, at least one chunk differs in at most radius // m bits
+    (pigeonhole), so a query only probes the chunk values within that
+    sub-radius and checks the few hashes found there. m is picked from the
+    number of hashes so that the probes times the expected bucket size stay
+    small; a query never scans the whole set.
+    """
+
+    def __init__(self, values: Iterable[int], radius: int, bits: int = HASH_BITS) -> None:
+        values = list(values)
+        count = max(len(values), 1)
+
+        def cost(chunks: int) -> float:
+            width = -(-bits // chunks)
+            return chunks * ball_size(width, radius // chunks) * max(1.0, count / 2**width)
+
+        chunks = min(range(1, min(radius, bits - 1) + 2), key=cost)
+        self.radius = radius
+        self.sub_radius = radius // chunks
+        self.widths = [bits // chunks + (1 if chunk < bits % chunks else 0) for chunk in range(chunks)]
+        self.shifts: List[int] = []
+        shift = bits
+        for width in self.widths:
+            shift -= width
+            self.shifts.append(shift)
+        # XOR masks for every chunk value within sub_radius of a key.
+        self.flips = [
+            [
+                sum(1 << bit for bit in combo)
+                for flipped in range(self.sub_radius + 1)
+                for combo in combinations(range(width), flipped)
+            ]
+            for width in self.widths
+        ]
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in self.widths]
+        for value in values:
+            for table, key in zip(self.tables, self._keys(value)):
+                table.setdefault(key, []).append(value)
+
+    def _keys(self, value: int) -> Iterator[int]:
+        for shift, width in zip(self.shifts, self.widths):
+            yield (value >> shift) & ((1 << width) - 1)
+
+    def search(self, value: int) -> Iterator[Tuple[int, int]]:
+        """Yield (hash, distance) for every stored hash within radius of value."""
+        seen: Set[int] = set()
+        for table, key, flips in zip(self.tables, self._keys(value), self.flips):
+            for flip in flips:
+                for candidate in table.get(key ^ flip, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = hamming(value, candidate)
+                    if distance <= self.radius:
+                        yield candidate, distance
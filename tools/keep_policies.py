@@ -0,0 +1,101 @@
+"""Keep policies: decide which copy in a duplicate set survives.
+
+A policy spec is NAME or NAME:ARG. Each policy turns a path into a sort key
+where lower keys win; several specs are compared in order and the shortest
+path breaks any remaining tie. Policies that stat the path rank a path that
+has disappeared last.
+
+  priority        earlier root on the command line wins
+  oldest          oldest mtime wins
+  newest          newest mtime wins
+  shortest        shortest path wins
+  largest         largest file wins (e.g. the original of a re-encoded photo)
+  regex:PATTERN   paths matching PATTERN win
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+KeyFunc = Callable[[str], object]
+PolicyFactory = Callable[[str, Sequence[Path]], KeyFunc]
+
+
+def priority_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    prefixes = [os.path.join(str(root), "") for root in roots]
+
+    def key(path: str) -> int:
+        for rank, prefix in enumerate(prefixes):
+            if path.startswith(prefix):
+                return rank
+        return len(prefixes)
+
+    return key
+
+
+def stat_key(field: str, sign: int) -> KeyFunc:
+    """Key on sign * os.stat(path).<field>; a path that cannot be stat'ed ranks last."""
+
+    def key(path: str) -> Tuple[int, int]:
+        try:
+            return 0, sign * getattr(os.stat(path), field)
+        except OSError:
+            # Vanished since the walk: never pick it as the copy to keep.
+            return 1, 0
+
+    return key
+
+
+def oldest_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    return stat_key("st_mtime_ns", 1)
+
+
+def newest_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    return stat_key("st_mtime_ns", -1)
+
+
+def shortest_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    return len
+
+
+def largest_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    return stat_key("st_size", -1)
+
+
+def regex_policy(arg: str, roots: Sequence[Path]) -> KeyFunc:
+    if not arg:
+        raise ValueError("regex policy needs a pattern, e.g. regex:/originals/")
+    pattern = re.compile(arg)
+    return lambda path: 0 if pattern.search(path) else 1
+
+
+KEEP_POLICIES: Dict[str, PolicyFactory] = {
+    "priority": priority_policy,
+    "oldest": oldest_policy,
+    "newest": newest_policy,
+    "shortest": shortest_policy,
+    "largest": largest_policy,
+    "regex": regex_policy,
+}
+
+
+def parse_policy(spec: str, roots: Sequence[Path]) -> KeyFunc:
+    name, _, arg = spec.partition(":")
+    factory = KEEP_POLICIES.get(name)
+    if factory is None:
+        raise ValueError(f"unknown keep policy {name!r} (choose from {', '.join(KEEP_POLICIES)})")
+    return factory(arg, roots)
+
+
+def make_select_keep(specs: Sequence[str], roots: Sequence[Path]) -> Callable[[List[str]], Tuple[str, List[str]]]:
+    keys = [parse_policy(spec, roots) for spec in specs]
+
+    def select_keep(paths: List[str]) -> Tuple[str, List[str]]:
+        sorted_paths = sorted(paths, key=lambda p: tuple(key(p) for key in keys) + (len(p), p))
+        return sorted_paths[0], sorted_paths[1:]
+
+    return select_keep
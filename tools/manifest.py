@@ -0,0 +1,84 @@
+"""Portable dedup manifests: the (size, digest) pairs of a reference tree.
+
+A manifest lets a tree be hashed once and compared against many times without
+touching it again. The file is gzip-compressed and holds a short header
+followed by fixed-width big-endian records sorted by (size, digest), so it can
+be streamed and merge-joined against another sorted list.
+"""
+
+from __future__ import annotations
+
+import gzip
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, List, Set, Tuple, TypeVar
+
+
+MAGIC = b"DDMANIF1"
+DIGEST_NAME = "blake2b-16"
+DIGEST_SIZE = 16
+HEADER = struct.Struct(">BQ")  # digest size, record count
+READ_RECORDS = 4096
+
+T = TypeVar("T")
+
+
+def record_struct(digest_size: int) -> struct.Struct:
+    return struct.Struct(f">Q{digest_size}s")
+
+
+def write_manifest(
+    path: Path, entries: Iterable[Tuple[int, bytes]], digest_name: str = DIGEST_NAME, digest_size: int = DIGEST_SIZE
+) -> int:
+    """Write sorted, de-duplicated (size, digest) entries and return their count."""
+    rows = sorted(set(entries))
+    record = record_struct(digest_size)
+    name = digest_name.encode("ascii")
+    with gzip.open(path, "wb") as handle:
+        handle.write(MAGIC + bytes([len(name)]) + name + HEADER.pack(digest_size, len(rows)))
+        for start in range(0, len(rows), READ_RECORDS):
+            handle.write(b"".join(record.pack(size, digest) for size, digest in rows[start : start + READ_RECORDS]))
+    return len(rows)
+
+
+def read_manifest(path: Path, digest_name: str = DIGEST_NAME) -> Iterator[Tuple[int, bytes]]:
+    """Stream (size, digest) entries in sorted order; ValueError if path is not a valid manifest."""
+    with gzip.open(path, "rb") as handle:
+        try:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"not a dedup manifest: {path}")
+            name = handle.read(handle.read(1)[0]).decode("ascii")
+            if name != digest_name:
+                raise ValueError(f"manifest {path} uses {name} digests, expected {digest_name}")
+            digest_size, count = HEADER.unpack(handle.read(HEADER.size))
+            record = record_struct(digest_size)
+            while count:
+                batch = min(count, READ_RECORDS)
+                data = handle.read(batch * record.size)
+                if len(data) != batch * record.size:
+                    raise ValueError(f"truncated manifest: {path}")
+                yield from record.iter_unpack(data)
+                count -= batch
+        except (gzip.BadGzipFile, EOFError, IndexError, UnicodeDecodeError, struct.error):
+            raise ValueError(f"not a dedup manifest, or damaged: {path}") from None
+
+
+def manifest_sizes(path: Path, digest_name: str = DIGEST_NAME) -> Set[int]:
+    return {size for size, _ in read_manifest(path, digest_name)}
+
+
+def merge_join(manifest: Iterable[Tuple[int, bytes]], entries: List[Tuple[int, bytes, T]]) -> Iterator[T]:
+    """Yield the payload of each entry whose (size, digest) is in the manifest.
+
+    Both inputs must be sorted by (size, digest); entries may repeat a key.
+    """
+    rows = iter(manifest)
+    current = next(rows, None)
+    for size, digest, payload in entries:
+        key = (size, digest)
+        while current is not None and current < key:
+            current = next(rows, None)
+        if current is None:
+            return
+        if current == key:
+            yield payload
@@ -0,0 +1,190 @@
+"""Compiled file patterns and size/age predicates for the cleanup tools.
+
+A pattern list is compiled once into a suffix set and a few regexes, so
+matching a file is a handful of set lookups and at most three regex calls no
+matter how many patterns were given.
+
+Pattern forms:
+  .tmp, tmp, .tar.gz   suffix of the file name, case-insensitive (leading dot optional)
+  keep.log             a dotted pattern without a leading dot is also matched against the
+                       whole file name, so "!keep.log" excludes a file named keep.log;
+                       bare extensions like "tmp" never match a file named "tmp"
+  *.log, cache-??.bin  glob on the file name, case-insensitive
+  logs/*.txt           glob containing a slash, matched against the path relative to the root
+  re:REGEX             regex searched in the path relative to the root; all regexes are
+                       joined into one alternation, so use scoped flags like (?i:...)
+  !PATTERN             exclude files matching any of the forms above
+  !NAME/               prune directories with this name (or glob) during the walk; NAME
+                       cannot contain a slash (use !dir/sub/* to exclude a nested path)
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import time
+from typing import Iterable, List, Optional, Pattern, Set
+
+from walker import FileRecord
+
+
+REGEX_PREFIX = "re:"
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+GLOB_CHARS = "*?["
+
+
+def parse_size(text: str) -> int:
+    """Parse "512", "10k", "1.5M" or "2GiB" into bytes (binary units)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def parse_age(text: str) -> float:
+    """Parse "90s", "15m", "12h", "30d" or "2w" into seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid age: {text!r}")
+    return float(match.group(1)) * AGE_UNITS[match.group(2).lower()]
+
+
+def _join(patterns: List[str], flags: int = 0) -> Optional[Pattern[str]]:
+    if not patterns:
+        return None
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+    except re.error as exc:
+        raise ValueError(f"invalid pattern: {exc}") from None
+
+
+class RuleSet:
+    """Suffixes, name globs, path globs and regexes, compiled for matching."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.suffixes: Set[str] = set()
+        self.names: Set[str] = set()
+        self.suffix_dots = 0
+        name_globs: List[str] = []
+        path_globs: List[str] = []
+        regexes: List[str] = []
+        for pattern in patterns:
+            if pattern.startswith(REGEX_PREFIX):
+                regexes.append(pattern[len(REGEX_PREFIX) :])
+            elif any(char in pattern for char in GLOB_CHARS) or "/" in pattern:
+                (path_globs if "/" in pattern else name_globs).append(fnmatch.translate(pattern))
+            else:
+                suffix = pattern.lower() if pattern.startswith(".") else "." + pattern.lower()
+                self.suffixes.add(suffix)
+                self.suffix_dots = max(self.suffix_dots, suffix.count("."))
+                if "." in pattern and not pattern.startswith("."):
+                    self.names.add(pattern.lower())
+        self.name_re = _join(name_globs, re.IGNORECASE)
+        self.path_re = _join(path_globs, re.IGNORECASE)
+        self.regex = _join(regexes)
+        self.uses_path = self.path_re is not None or self.regex is not None
+        self.active = bool(self.suffixes) or self.name_re is not None or self.uses_path
+
+    def matches(self, name: str, relpath: str) -> bool:
+        if self.suffixes:
+            # Try the whole name against explicit names, then each suffix
+            # starting at one of the last suffix_dots dots: "a.tar.gz" ->
+            # ".gz", ".tar.gz".
+            lowered = name.lower()
+            if lowered in self.names:
+                return True
+            end = len(lowered)
+            for _ in range(self.suffix_dots):
+                end = lowered.rfind(".", 0, end)
+                if end == -1:
+                    break
+                if lowered[end:] in self.suffixes:
+                    return True
+        if self.name_re is not None and self.name_re.match(name):
+            return True
+        if self.path_re is not None and self.path_re.match(relpath):
+            return True
+        return self.regex is not None and self.regex.search(relpath) is not None
+
+
+class PathMatcher:
+    """Decide whether a FileRecord is selected.
+
+    A file is selected when it matches an include pattern (or there are none
+    and at least one predicate was given), matches no exclude pattern and
+    passes the size and age predicates. skip_dirs holds the names to prune
+    while walking; pass them to the walker together with any --skip-dir.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        patterns: Iterable[str],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        older_than: Optional[float] = None,
+        newer_than: Optional[float] = None,
+    ) -> None:
+        includes: List[str] = []
+        excludes: List[str] = []
+        self.skip_dirs: List[str] = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            if not pattern:
+                continue
+            if pattern.endswith("/") and not pattern.startswith(REGEX_PREFIX):
+                if not negated:
+                    raise ValueError(f"directory patterns can only exclude: use !{pattern}")
+                name = pattern.rstrip("/")
+                if "/" in name:
+                    # The walker prunes by entry name, so this would never match.
+                    raise ValueError(
+                        f"directory pattern !{pattern} must be a single name or glob; "
+                        f"use !{name.rsplit('/', 1)[1]}/ or !{name}/*"
+                    )
+                self.skip_dirs.append(name)
+                continue
+            (excludes if negated else includes).append(pattern)
+
+        self.include = RuleSet(includes)
+        self.exclude = RuleSet(excludes)
+        now_ns = time.time_ns()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.mtime_before = None if older_than is None else now_ns - int(older_than * 1e9)
+        self.mtime_after = None if newer_than is None else now_ns - int(newer_than * 1e9)
+        self.needs_stat = any(
+            value is not None for value in (min_size, max_size, self.mtime_before, self.mtime_after)
+        )
+        if not self.include.active and not self.needs_stat:
+            raise ValueError("no include pattern or size/age predicate given")
+
+        root = os.fspath(root)
+        self._prefix_len = len(root if root.endswith(os.sep) else root + os.sep)
+        self._uses_path = self.include.uses_path or self.exclude.uses_path
+        self._include = self.include.active
+        self._exclude = self.exclude.active
+
+    def passes_stat(self, record: FileRecord) -> bool:
+        if self.min_size is not None and record.size < self.min_size:
+            return False
+        if self.max_size is not None and record.size > self.max_size:
+            return False
+        if self.mtime_before is not None and record.mtime_ns > self.mtime_before:
+            return False
+        return self.mtime_after is None or record.mtime_ns >= self.mtime_after
+
+    def __call__(self, record: FileRecord) -> bool:
+        path = record.path
+        name = path[path.rfind(os.sep) + 1 :]
+        relpath = path[self._prefix_len :].replace(os.sep, "/") if self._uses_path else ""
+        if self._include and not self.include.matches(name, relpath):
+            return False
+        if self._exclude and self.exclude.matches(name, relpath):
+            return False
+        return not self.needs_stat or self.passes_stat(record)
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
-"""Remove files in a directory that match a list of extensions.
+"""Remove files in a directory that match a list of extensions or patterns.
 
 Usage:
-  python remove_by_extension.py /path/to/dir .tmp .bak .DS_Store [--dry-run]
+  python remove_by_extension.py /path/to/dir .tmp .bak .tar.gz '*.log' 're:cache/.*' '!keep.log' '!build/'
+      [--min-size SIZE] [--max-size SIZE] [--older-than AGE] [--newer-than AGE] [--dry-run]
+      [--skip-dir NAME] [--follow-symlinks] [--walk-threads N [--walk-ordered]] [--progress] [--stats-json PATH]
+      [--action-log PATH]
 
 Notes:
-  - Extensions are matched case-insensitively.
+  - Extensions are matched case-insensitively, including multi-dot suffixes.
   - Leading dots are optional ("tmp" == ".tmp").
+  - Globs, re:REGEX, !PATTERN exclusions and !DIR/ pruning are described in
+    patterns.py.
+  - Sizes accept k/M/G suffixes ("10M"); ages accept s/m/h/d/w ("30d").
+  - Files are only stat'ed when a size or age predicate is given.
+  - Symlinked files are never touched; --follow-symlinks only enters symlinked directories.
 """
 
 from __future__ import annotations
@@ -14,47 +22,62 @@ from __future__ import annotations
 import argparse
 import os
 from pathlib import Path
-from typing import Iterable, List, Set
-
-
-def iter_files(root: Path) -> Iterable[Path]:
-    for dirpath, _, filenames in os.walk(root):
-        for name in filenames:
-            path = Path(dirpath) / name
-            if path.is_file():
-                yield path
-
-
-def normalize_extensions(exts: List[str]) -> Set[str]:
-    normalized = set()
-    for ext in exts:
-        ext = ext.strip()
-        if not ext:
-            continue
-        if not ext.startswith("."):
-            ext = "." + ext
-        normalized.add(ext.lower())
-    return normalized
-
-
-def remove_matching_files(root: Path, extensions: Set[str], dry_run: bool) -> int:
-    removed = 0
-    for path in iter_files(root):
-        if path.suffix.lower() in extensions:
-            if dry_run:
-                print(f"[dry-run] remove {path}")
-            else:
-                os.remove(path)
-                print(f"removed {path}")
-            removed += 1
-    return removed
+from typing import Iterable, Optional
+
+from bulk_delete import DeletePlan, add_action_log_args, run_plan
+from checksums import Prefetch
+from patterns import PathMatcher, parse_age, parse_size
+from run_stats import RunStats, add_stats_args
+from walker import add_walk_args, iter_files
+
+
+def plan_matching_files(
+    root: Path,
+    matcher: PathMatcher,
+    skip_dirs: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    stats: Optional[RunStats] = None,
+    walk_threads: int = 1,
+    walk_ordered: bool = False,
+) -> DeletePlan:
+    plan = DeletePlan()
+    # Directories excluded by a pattern are pruned by the walker, and files
+    # are only stat'ed when a size or age predicate needs it.
+    skip = list(skip_dirs) + matcher.skip_dirs
+    files = iter_files(
+        root, skip, follow_symlinks, stat=matcher.needs_stat, threads=walk_threads, ordered=walk_ordered
+    )
+    for record in Prefetch(files, stats=stats):
+        if matcher(record):
+            plan.unlink(record.path)
+    return plan
+
+
+def remove_matching_files(
+    root: Path,
+    matcher: PathMatcher,
+    dry_run: bool,
+    skip_dirs: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    stats: Optional[RunStats] = None,
+    action_log: Optional[Path] = None,
+) -> int:
+    plan = plan_matching_files(root, matcher, skip_dirs, follow_symlinks, stats)
+    return run_plan(plan, dry_run, action_log)
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Remove files that match a list of extensions.")
+    parser = argparse.ArgumentParser(description="Remove files that match a list of extensions or patterns.")
     parser.add_argument("dir", type=Path, help="Directory to scan")
-    parser.add_argument("extensions", nargs="+", help="Extensions to remove")
+    parser.add_argument("patterns", nargs="*", help="Extensions, globs, re:REGEX, !PATTERN or !DIR/")
+    parser.add_argument("--min-size", type=parse_size, help="Only files at least this large (e.g. 10M)")
+    parser.add_argument("--max-size", type=parse_size, help="Only files at most this large")
+    parser.add_argument("--older-than", type=parse_age, help="Only files last modified longer ago (e.g. 30d)")
+    parser.add_argument("--newer-than", type=parse_age, help="Only files modified more recently (e.g. 12h)")
     parser.add_argument("--dry-run", action="store_true", help="Print files that would be removed")
+    add_walk_args(parser)
+    add_stats_args(parser)
+    add_action_log_args(parser)
     return parser.parse_args()
 
 
@@ -63,13 +86,25 @@ def main() -> None:
     if not args.dir.is_dir():
         raise SystemExit(f"dir is not a directory: {args.dir}")
 
-    extensions = normalize_extensions(args.extensions)
-    print(extensions)
-    if not extensions:
-        raise SystemExit("No valid extensions provided.")
-
-    removed = remove_matching_files(args.dir, extensions, args.dry_run)
+    try:
+        matcher = PathMatcher(
+            os.fspath(args.dir), args.patterns, args.min_size, args.max_size, args.older_than, args.newer_than
+        )
+    except ValueError as exc:
+        raise SystemExit(f"Invalid patterns: {exc}")
+
+    stats = RunStats(args.progress)
+    with stats.phase("scan"):
+        plan = plan_matching_files(
+            args.dir, matcher, args.skip_dir, args.follow_symlinks, stats, args.walk_threads, args.walk_ordered
+        )
+    stats.finish()
+    with stats.phase("delete"):
+        removed = run_plan(plan, args.dry_run, args.action_log)
+    stats.count("removed", removed)
     print(f"Done. Removed {removed} files.")
+    if args.stats_json:
+        stats.write_json(args.stats_json)
 
 
 if __name__ == "__main__":
@@ -3,102 +3,207 @@
 
 Usage:
   python remove_duplicates.py /path/to/dir1 /path/to/dir2 [--workers N] [--dry-run]
+      [--backend auto|process|thread] [--batch-files N] [--batch-bytes N] [--cache PATH]
+      [--journal PATH [--resume]] [--hasher NAME] [--read-size SIZE] [--follow-symlinks]
+      [--walk-threads N [--walk-ordered]] [--export-manifest PATH] [--progress] [--stats-json PATH]
+      [--action-log PATH]
+  python remove_duplicates.py /path/to/dir1 --export-manifest dir1.ddm
+  python remove_duplicates.py --reference-manifest dir1.ddm /path/to/dir2 [--dry-run]
+
+Notes:
+  - Symlinked files are never touched; --follow-symlinks only enters symlinked directories.
+  - Hashing starts while the directory walk is still running; the walk
+    blocks once a fixed number of paths are queued.
+  - Files are sent to workers in batches of up to --batch-files files or
+    --batch-bytes bytes; --backend auto uses threads for large average file
+    sizes and processes otherwise.
+  - --cache keeps checksums in a SQLite file; files whose device, inode, size
+    and mtime are unchanged are not read again on the next run.
+  - --journal appends every finished checksum to a JSON-lines file as the
+    run goes; after a crash, rerun with --resume to hash only the rest.
+  - --export-manifest writes the sizes and digests of dir1 to a compressed
+    manifest. --reference-manifest dedupes a directory against that manifest
+    without dir1 being present; only files whose size appears in the
+    manifest are hashed. Both runs must use the same --hasher.
+  - --hasher and --read-size: see hashers.py.
 """
 
 from __future__ import annotations
 
 import argparse
-import hashlib
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
-
-
-READ_SIZE = 1024 * 1024  # 1 MiB
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bulk_delete import DeletePlan, add_action_log_args, run_plan
+from checksums import (
+    DigestStore,
+    Prefetch,
+    Schedule,
+    add_cache_args,
+    add_worker_args,
+    build_checksum_index,
+    cached_file_checksums,
+    open_digest_store,
+    print_cache_stats,
+)
+from hashers import HASHERS, add_hasher_args
+from manifest import manifest_sizes, merge_join, read_manifest, write_manifest
+from run_stats import RunStats, add_stats_args
+from walker import FileRecord, add_walk_args, iter_files
+
+
+def remove_files(duplicates: Iterable[Tuple[str, str]], dry_run: bool, action_log: Optional[Path] = None) -> int:
+    """Remove each path of (path, kept copy) pairs; the kept copy may be "" when it is not on disk."""
+    plan = DeletePlan()
+    for path, keep in duplicates:
+        plan.unlink(path, keep=keep)
+    return run_plan(plan, dry_run, action_log)
+
+
+def find_duplicates(index_a: Dict[str, List[str]], index_b: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    """Return (path in dir2, dir1 copy it duplicates) pairs."""
+    common = set(index_a.keys()) & set(index_b.keys())
+    return [(path, index_a[digest][0]) for digest in common for path in index_b[digest]]
 
 
-def iter_files(root: Path) -> Iterable[Path]:
-    for dirpath, _, filenames in os.walk(root):
-        for name in filenames:
-            path = Path(dirpath) / name
-            if path.is_file():
-                yield path
+def remove_duplicates(index_a: Dict[str, List[str]], index_b: Dict[str, List[str]], dry_run: bool) -> int:
+    return remove_files(find_duplicates(index_a, index_b), dry_run)
 
 
-def file_checksum(path: Path) -> Tuple[str, str]:
-    # blake2b is fast and in the standard library
-    hasher = hashlib.blake2b(digest_size=16)
-    with path.open("rb") as handle:
-        while True:
-            chunk = handle.read(READ_SIZE)
-            if not chunk:
-                break
-            hasher.update(chunk)
-    return hasher.hexdigest(), str(path)
+def remember_sizes(records: Iterable[FileRecord], sizes: Dict[str, int]) -> Iterator[FileRecord]:
+    """Pass records through, noting each size as the walk produced it."""
+    for record in records:
+        sizes[record.path] = record.size
+        yield record
 
 
-def build_checksum_index(paths: Iterable[Path], workers: int) -> Dict[str, List[str]]:
-    index: Dict[str, List[str]] = {}
-    if workers <= 1:
-        for path in paths:
-            digest, name = file_checksum(path)
-            index.setdefault(digest, []).append(name)
-        return index
+def manifest_entries(index: Dict[str, List[str]], sizes: Dict[str, int]) -> Iterator[Tuple[int, bytes]]:
+    for digest, paths in index.items():
+        yield sizes[paths[0]], bytes.fromhex(digest)
 
-    with ProcessPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(file_checksum, path) for path in paths]
-        for future in as_completed(futures):
-            digest, name = future.result()
-            index.setdefault(digest, []).append(name)
-    return index
 
+def find_manifest_duplicates(
+    manifest: Path, records: Iterable[FileRecord], schedule: Schedule, cache: Optional[DigestStore]
+) -> Tuple[List[str], int]:
+    """Return (paths whose content is in the manifest, files skipped by size)."""
+    sizes = manifest_sizes(manifest, schedule.hasher)
+    record_sizes: Dict[str, int] = {}
+    skipped = 0
 
-def remove_duplicates(index_a: Dict[str, List[str]], index_b: Dict[str, List[str]], dry_run: bool) -> int:
-    common = set(index_a.keys()) & set(index_b.keys())
-    removed = 0
-    for digest in common:
-        for path in index_b[digest]:
-            if dry_run:
-                print(f"[dry-run] remove {path}")
+    def candidates() -> Iterator[FileRecord]:
+        nonlocal skipped
+        for record in records:
+            if record.size in sizes:
+                record_sizes[record.path] = record.size
+                yield record
             else:
-                os.remove(path)
-                print(f"removed {path}")
-            removed += 1
-    return removed
+                skipped += 1
+
+    entries = sorted(
+        (record_sizes[name], bytes.fromhex(digest), name)
+        for digest, name in cached_file_checksums(candidates(), schedule, cache)
+    )
+    return list(merge_join(read_manifest(manifest, schedule.hasher), entries)), skipped
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Remove files in dir2 that also exist in dir1 based on checksum.")
-    parser.add_argument("dir1", type=Path, help="First directory (reference)")
-    parser.add_argument("dir2", type=Path, help="Second directory (files removed here)")
-    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0=auto, 1=single process)")
+    parser.add_argument("dir1", type=Path, help="First directory (reference), or dir2 with --reference-manifest")
+    parser.add_argument("dir2", type=Path, nargs="?", help="Second directory (files removed here)")
+    add_worker_args(parser)
     parser.add_argument("--dry-run", action="store_true", help="Print files that would be removed")
+    add_walk_args(parser, skip_dirs=False)
+    add_cache_args(parser)
+    add_hasher_args(parser, prefilter=False)
+    parser.add_argument("--export-manifest", type=Path, help="Write the dir1 index to a manifest file")
+    parser.add_argument("--reference-manifest", type=Path, help="Use a manifest instead of dir1 as reference")
+    add_stats_args(parser)
+    add_action_log_args(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    if not args.dir1.is_dir():
+    if args.reference_manifest:
+        if args.dir2 is not None:
+            raise SystemExit("--reference-manifest replaces dir1; pass only the directory to clean")
+        if args.export_manifest:
+            raise SystemExit("--export-manifest needs dir1, not --reference-manifest")
+        if not args.reference_manifest.is_file():
+            raise SystemExit(f"no manifest at {args.reference_manifest}")
+        args.dir1, args.dir2 = None, args.dir1
+    elif args.dir1 is None or not args.dir1.is_dir():
         raise SystemExit(f"dir1 is not a directory: {args.dir1}")
-    if not args.dir2.is_dir():
+    if args.dir2 is None and not args.export_manifest:
+        raise SystemExit("dir2 is required unless --export-manifest is given")
+    if args.dir2 is not None and not args.dir2.is_dir():
         raise SystemExit(f"dir2 is not a directory: {args.dir2}")
 
     workers = args.workers
     if workers == 0:
         workers = max(os.cpu_count() or 1, 1)
-
-    paths_a = list(iter_files(args.dir1))
-    paths_b = list(iter_files(args.dir2))
-
-    print(f"Indexing {len(paths_a)} files in {args.dir1}")
-    index_a = build_checksum_index(paths_a, workers)
-
-    print(f"Indexing {len(paths_b)} files in {args.dir2}")
-    index_b = build_checksum_index(paths_b, workers)
-
-    removed = remove_duplicates(index_a, index_b, args.dry_run)
-    print(f"Done. Removed {removed} files.")
+    stats = RunStats(args.progress)
+    schedule = Schedule(
+        workers, args.backend, args.batch_files, args.batch_bytes, stats, hasher=args.hasher, read_size=args.read_size
+    )
+
+    cache = open_digest_store(args.cache, args.journal, args.resume, args.hasher)
+
+    index_a: Dict[str, List[str]] = {}
+    sizes_a: Dict[str, int] = {}
+    if args.dir1 is not None:
+        print(f"Indexing files in {args.dir1}")
+        files_a = iter_files(
+            args.dir1, follow_symlinks=args.follow_symlinks, threads=args.walk_threads, ordered=args.walk_ordered
+        )
+        if args.export_manifest:
+            files_a = remember_sizes(files_a, sizes_a)
+        files_a = Prefetch(files_a, stats=stats)
+        index_a = build_checksum_index(files_a, schedule, cache)
+        stats.finish()
+        print(f"Indexed {sum(len(paths) for paths in index_a.values())} files")
+    if args.export_manifest:
+        count = write_manifest(
+            args.export_manifest, manifest_entries(index_a, sizes_a), args.hasher, HASHERS[args.hasher].digest_size
+        )
+        print(f"Wrote {count} entries to {args.export_manifest}")
+
+    duplicates: List[Tuple[str, str]] = []
+    if args.dir2 is not None:
+        print(f"Indexing files in {args.dir2}")
+        files_b = iter_files(
+            args.dir2, follow_symlinks=args.follow_symlinks, threads=args.walk_threads, ordered=args.walk_ordered
+        )
+        files_b = Prefetch(files_b, stats=stats)
+        if args.reference_manifest:
+            try:
+                matches, skipped = find_manifest_duplicates(args.reference_manifest, files_b, schedule, cache)
+            except ValueError as exc:
+                raise SystemExit(f"cannot use --reference-manifest: {exc}")
+            # The reference copies are not on disk here, so there is no kept path to check.
+            duplicates = [(path, "") for path in matches]
+            stats.finish()
+            print(f"Skipped {skipped} files whose size is not in {args.reference_manifest}")
+        else:
+            index_b = build_checksum_index(files_b, schedule, cache)
+            stats.finish()
+            print(f"Indexed {sum(len(paths) for paths in index_b.values())} files")
+            duplicates = find_duplicates(index_a, index_b)
+    stats.finish()
+    print_cache_stats(cache)
+    if cache is not None:
+        stats.count("cache_hits", cache.hits)
+        stats.count("cache_misses", cache.misses)
+        cache.close()
+
+    if args.dir2 is not None:
+        with stats.phase("delete"):
+            removed = remove_files(duplicates, args.dry_run, args.action_log)
+        stats.count("removed", removed)
+        print(f"Done. Removed {removed} files.")
+    if args.stats_json:
+        stats.write_json(args.stats_json)
 
 
 if __name__ == "__main__":
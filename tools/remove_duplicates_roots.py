@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Remove duplicate files across any number of roots, keeping one copy per set.
+
+Usage:
+  python remove_duplicates_roots.py /mnt/a /mnt/b /mnt/c [--keep POLICY ...] [--workers N] [--dry-run]
+      [--skip-dir NAME] [--backend auto|process|thread] [--cache PATH] [--journal PATH [--resume]]
+      [--compact-index] [--hasher NAME] [--prefilter NAME] [--read-size SIZE] [--link [hardlink|reflink]]
+      [--follow-symlinks] [--walk-threads N [--walk-ordered]] [--progress] [--stats-json PATH]
+      [--action-log PATH]
+
+Notes:
+  - All roots are walked and hashed in one pass into a single index, using the
+    same staged size/partial/full matcher as remove_duplicates_shortest.py,
+    which also defines the options shared by both scripts.
+  - --keep is repeatable and applied in order (default: priority). Policies:
+    priority (earlier root wins), oldest, newest, shortest, largest, regex:PATTERN.
+    The shortest path breaks remaining ties.
+  - Roots must not overlap; a root nested in another would list files twice.
+  - --hasher, --prefilter and --read-size: see hashers.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import List
+
+from keep_policies import KEEP_POLICIES, make_select_keep
+from remove_duplicates_shortest import add_dedup_args, run_dedup
+
+
+def check_roots(roots: List[Path]) -> List[Path]:
+    resolved = [root.resolve() for root in roots]
+    for i, root in enumerate(resolved):
+        if not root.is_dir():
+            raise SystemExit(f"root is not a directory: {roots[i]}")
+        for other in resolved[:i]:
+            if root == other or root in other.parents or other in root.parents:
+                raise SystemExit(f"roots overlap: {other} and {root}")
+    return resolved
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Remove duplicate files across several roots, keeping one copy chosen by policy."
+    )
+    parser.add_argument("roots", nargs="+", type=Path, help="Directories to de-duplicate, in priority order")
+    parser.add_argument(
+        "--keep",
+        action="append",
+        default=[],
+        help=f"Keep policy, repeatable ({', '.join(KEEP_POLICIES)}; regex takes regex:PATTERN)",
+    )
+    add_dedup_args(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    roots = check_roots(args.roots)
+    try:
+        select_keep = make_select_keep(args.keep or ["priority"], roots)
+    except (ValueError, re.error) as exc:
+        raise SystemExit(f"invalid --keep: {exc}")
+    run_dedup(args, roots, select_keep)
+
+
+if __name__ == "__main__":
+    main()
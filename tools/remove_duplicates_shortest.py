@@ -2,59 +2,71 @@
 """Remove duplicate files, keeping the shortest path in each duplicate set.
 
 Usage:
-  python remove_duplicates_shortest.py /path/to/dir [--workers N] [--dry-run]
+  python remove_duplicates_shortest.py /path/to/dir [--workers N] [--dry-run] [--no-staged]
+      [--backend auto|process|thread] [--batch-files N] [--batch-bytes N] [--cache PATH]
+      [--journal PATH [--resume]] [--compact-index] [--hasher NAME] [--prefilter NAME] [--read-size SIZE]
+      [--link [hardlink|reflink]] [--skip-dir NAME] [--follow-symlinks] [--walk-threads N [--walk-ordered]]
+      [--progress] [--stats-json PATH] [--action-log PATH]
+
+Notes:
+  - Symlinked files are never touched; --follow-symlinks only enters symlinked directories.
+  - Files are matched in stages: by size, then by a hash of their first and
+    last blocks, and only the remaining candidates get a full checksum.
+  - --no-staged hashes every file in full (the original behaviour). Hashing
+    then starts while the directory walk is still running; the walk blocks
+    once a fixed number of paths are queued. The staged matcher needs every
+    file size first, so it overlaps the walk with size grouping only.
+  - Files are sent to workers in batches of up to --batch-files files or
+    --batch-bytes bytes; --backend auto uses threads for large average file
+    sizes and processes otherwise.
+  - --cache keeps checksums in a SQLite file; files whose device, inode, size
+    and mtime are unchanged are not read again on the next run.
+  - --journal appends every finished checksum to a JSON-lines file as the
+    run goes; after a crash, rerun with --resume to hash only the rest.
+  - --link keeps every path and replaces duplicates with hardlinks (or
+    copy-on-write reflinks, falling back to hardlinks) to the kept file.
+    Each replacement is a link to a temporary name followed by a rename.
+  - --compact-index stores digests and paths in flat arrays (see
+    compact_index.py), for trees where the dict index would not fit in memory.
+  - --hasher, --prefilter and --read-size: see hashers.py.
 """
 
 from __future__ import annotations
 
 import argparse
-import hashlib
+import errno
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import shutil
+from itertools import chain
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
-
-
-READ_SIZE = 1024 * 1024  # 1 MiB
-
-
-def iter_files(root: Path, skip_dirs: Iterable[str]) -> Iterable[Path]:
-    skip_set = {name for name in skip_dirs if name}
-    for dirpath, dirnames, filenames in os.walk(root):
-        if skip_set:
-            dirnames[:] = [name for name in dirnames if name not in skip_set]
-        for name in filenames:
-            path = Path(dirpath) / name
-            if path.is_file():
-                yield path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+from bulk_delete import DeletePlan, add_action_log_args, run_plan
+from checksums import (
+    ChecksumIndex,
+    Prefetch,
+    Schedule,
+    add_cache_args,
+    add_worker_args,
+    build_checksum_index,
+    build_staged_index,
+    open_digest_store,
+    print_cache_stats,
+    print_stage_stats,
+)
+from hashers import add_hasher_args
+from run_stats import RunStats, add_stats_args
+from walker import add_walk_args, iter_files
 
-def file_checksum(path: Path) -> Tuple[str, str]:
-    # blake2b is fast and in the standard library
-    hasher = hashlib.blake2b(digest_size=16)
-    with path.open("rb") as handle:
-        while True:
-            chunk = handle.read(READ_SIZE)
-            if not chunk:
-                break
-            hasher.update(chunk)
-    return hasher.hexdigest(), str(path)
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
 
 
-def build_checksum_index(paths: Iterable[Path], workers: int) -> Dict[str, List[str]]:
-    index: Dict[str, List[str]] = {}
-    if workers <= 1:
-        for path in paths:
-            digest, name = file_checksum(path)
-            index.setdefault(digest, []).append(name)
-        return index
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
 
-    with ProcessPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(file_checksum, path) for path in paths]
-        for future in as_completed(futures):
-            digest, name = future.result()
-            index.setdefault(digest, []).append(name)
-    return index
+SelectKeep = Callable[[List[str]], Tuple[str, List[str]]]
 
 
 def select_keep_shortest(paths: List[str]) -> Tuple[str, List[str]]:
@@ -64,20 +76,127 @@ def select_keep_shortest(paths: List[str]) -> Tuple[str, List[str]]:
     return keep, remove
 
 
-def remove_duplicates(index: Dict[str, List[str]], dry_run: bool) -> int:
-    removed = 0
+def plan_duplicates(index: ChecksumIndex, select_keep: SelectKeep = select_keep_shortest) -> DeletePlan:
+    plan = DeletePlan()
     for paths in index.values():
         if len(paths) <= 1:
             continue
-        keep, remove_paths = select_keep_shortest(paths)
+        keep, remove_paths = select_keep(paths)
         for path in remove_paths:
-            if dry_run:
-                print(f"[dry-run] remove {path} (kept {keep})")
-            else:
-                os.remove(path)
-                print(f"removed {path} (kept {keep})")
-            removed += 1
-    return removed
+            plan.unlink(path, keep=keep)
+    return plan
+
+
+def remove_duplicates(
+    index: ChecksumIndex,
+    dry_run: bool,
+    select_keep: SelectKeep = select_keep_shortest,
+    action_log: Optional[Path] = None,
+) -> int:
+    return run_plan(plan_duplicates(index, select_keep), dry_run, action_log)
+
+
+def reflink(src: str, dst: str) -> None:
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform", dst)
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def replace_with_link(keep: str, path: str, mode: str) -> str:
+    """Atomically replace path with a link to keep and return the kind used.
+
+    The link is created under a temporary name next to path and renamed over
+    it, so path always exists. Reflinks fall back to hardlinks when the
+    filesystem cannot share extents.
+    """
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.dedup-{os.getpid()}")
+    try:
+        kind = "hardlink"
+        if mode == "reflink":
+            try:
+                reflink(keep, tmp)
+                shutil.copystat(path, tmp)
+                kind = "reflink"
+            except OSError:
+                if os.path.lexists(tmp):
+                    os.remove(tmp)
+        if kind == "hardlink":
+            os.link(keep, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+    return kind
+
+
+def link_duplicates(
+    index: ChecksumIndex, mode: str, dry_run: bool, select_keep: SelectKeep = select_keep_shortest
+) -> Tuple[int, int]:
+    """Replace duplicates with links to the kept path (the shortest by default).
+
+    Returns (files linked, bytes reclaimed). Paths that already share the kept
+    file's inode are left alone. An inode's bytes only count as reclaimed when
+    every one of its links is replaced.
+    """
+    linked = 0
+    reclaimed = 0
+    for paths in index.values():
+        if len(paths) <= 1:
+            continue
+        keep, other_paths = select_keep(paths)
+        keep_stat = os.stat(keep)
+        by_inode: Dict[Tuple[int, int], List[str]] = {}
+        stats: Dict[Tuple[int, int], os.stat_result] = {}
+        for path in other_paths:
+            st = os.stat(path)
+            inode = (st.st_dev, st.st_ino)
+            if inode == (keep_stat.st_dev, keep_stat.st_ino):
+                continue
+            by_inode.setdefault(inode, []).append(path)
+            stats[inode] = st
+
+        for inode, inode_paths in by_inode.items():
+            done = 0
+            for path in inode_paths:
+                if dry_run:
+                    print(f"[dry-run] link {path} -> {keep}")
+                else:
+                    try:
+                        kind = replace_with_link(keep, path, mode)
+                    except OSError as exc:
+                        print(f"skipped {path}: {exc}")
+                        continue
+                    print(f"{kind} {path} -> {keep}")
+                done += 1
+            linked += done
+            if done == stats[inode].st_nlink:
+                reclaimed += stats[inode].st_size
+    return linked, reclaimed
+
+
+def add_dedup_args(parser: argparse.ArgumentParser) -> None:
+    """Options shared with remove_duplicates_roots.py; see run_dedup."""
+    add_worker_args(parser)
+    parser.add_argument("--dry-run", action="store_true", help="Print files that would be removed")
+    add_walk_args(parser)
+    add_cache_args(parser)
+    add_hasher_args(parser)
+    parser.add_argument(
+        "--compact-index",
+        action="store_true",
+        help="Keep the checksum index in compact arrays instead of Python dicts (for very large trees)",
+    )
+    parser.add_argument(
+        "--link",
+        nargs="?",
+        const="hardlink",
+        choices=("hardlink", "reflink"),
+        help="Replace duplicates with links to the kept file instead of removing them",
+    )
+    add_stats_args(parser)
+    add_action_log_args(parser)
 
 
 def parse_args() -> argparse.Namespace:
@@ -86,32 +205,78 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("dir", type=Path, help="Directory to de-duplicate")
     parser.add_argument(
-        "--skip-dir",
-        action="append",
-        default=[],
-        help="Directory name to skip (repeatable)",
+        "--no-staged",
+        action="store_true",
+        help="Hash every file in full instead of filtering by size and partial hash first",
     )
-    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0=auto, 1=single process)")
-    parser.add_argument("--dry-run", action="store_true", help="Print files that would be removed")
+    add_dedup_args(parser)
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
-    if not args.dir.is_dir():
-        raise SystemExit(f"dir is not a directory: {args.dir}")
+def run_dedup(
+    args: argparse.Namespace, roots: Sequence[Path], select_keep: SelectKeep, staged: bool = True
+) -> None:
+    """Index the files under roots and remove (or link) duplicates, per add_dedup_args options."""
+    if args.link and args.action_log:
+        raise SystemExit("--action-log records deletions and cannot be used with --link")
 
     workers = args.workers
     if workers == 0:
         workers = max(os.cpu_count() or 1, 1)
+    stats = RunStats(args.progress)
+    schedule = Schedule(
+        workers,
+        args.backend,
+        args.batch_files,
+        args.batch_bytes,
+        stats,
+        hasher=args.hasher,
+        prefilter=args.prefilter,
+        read_size=args.read_size,
+    )
+
+    files = chain.from_iterable(
+        iter_files(root, args.skip_dir, args.follow_symlinks, threads=args.walk_threads, ordered=args.walk_ordered)
+        for root in roots
+    )
+    paths = Prefetch(files, stats=stats)
+
+    cache = open_digest_store(args.cache, args.journal, args.resume, args.hasher)
 
-    paths = list(iter_files(args.dir, args.skip_dir))
+    print(f"Indexing files in {roots[0] if len(roots) == 1 else f'{len(roots)} roots'}")
+    if staged:
+        index, stages = build_staged_index(paths, schedule, cache, args.compact_index)
+        stats.finish()
+        print_stage_stats(stages)
+    else:
+        index = build_checksum_index(paths, schedule, cache, args.compact_index)
+        stats.finish()
+        print(f"Indexed {sum(len(group) for group in index.values())} files")
+    print_cache_stats(cache)
+    if cache is not None:
+        stats.count("cache_hits", cache.hits)
+        stats.count("cache_misses", cache.misses)
+        cache.close()
 
-    print(f"Indexing {len(paths)} files in {args.dir}")
-    index = build_checksum_index(paths, workers)
+    with stats.phase("delete"):
+        if args.link:
+            linked, reclaimed = link_duplicates(index, args.link, args.dry_run, select_keep)
+            stats.count("linked", linked)
+            stats.count("reclaimed_bytes", reclaimed)
+            print(f"Done. Linked {linked} files, reclaimed {reclaimed} bytes.")
+        else:
+            removed = remove_duplicates(index, args.dry_run, select_keep, args.action_log)
+            stats.count("removed", removed)
+            print(f"Done. Removed {removed} files.")
+    if args.stats_json:
+        stats.write_json(args.stats_json)
 
-    removed = remove_duplicates(index, args.dry_run)
-    print(f"Done. Removed {removed} files.")
+
+def main() -> None:
+    args = parse_args()
+    if not args.dir.is_dir():
+        raise SystemExit(f"dir is not a directory: {args.dir}")
+    run_dedup(args, [args.dir], select_keep_shortest, staged=not args.no_staged)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,17 @@
 """Remove empty folders from a directory tree.
 
 Usage:
-  python remove_empty_folders.py /path/to/root [--dry-run]
+  python remove_empty_folders.py /path/to/root [--dry-run] [--progress] [--stats-json PATH]
+      [--action-log PATH] [--ignore-file NAME] [--ignore-junk] [--walk-threads N] [--remove-root]
+
+Notes:
+  - A folder counts as empty when all of its subfolders are empty, so whole
+    empty subtrees are removed in one pass.
+  - Files matched by --ignore-file (names or globs) or --ignore-junk
+    (.DS_Store, Thumbs.db, ...) do not keep a folder alive; they are deleted
+    together with it.
+  - The root itself is kept even when the whole tree is empty, unless
+    --remove-root is given.
 """
 
 from __future__ import annotations
@@ -10,36 +20,108 @@ from __future__ import annotations
 import argparse
 import os
 from pathlib import Path
-from typing import List
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from bulk_delete import RMDIR, DeletePlan, add_action_log_args, execute_plan
+from run_stats import RunStats, add_stats_args
+from walker import DirListing, FileRecord, add_walk_args, make_skip_matcher, walk
+
 
+JUNK_FILES = (".DS_Store", "Thumbs.db", "ehthumbs.db", "desktop.ini", "._*")
 
-def find_empty_dirs(root: Path) -> List[Path]:
-    # Walk bottom-up so nested empty folders are removed first.
-    empty_dirs: List[Path] = []
-    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
-        if dirnames or filenames:
-            # Directory is not empty.
+
+def collect_empty_dirs(
+    listings: Iterable[DirListing],
+    removable: Optional[Callable[[FileRecord], bool]] = None,
+    keep: Optional[str] = None,
+) -> Tuple[List[str], List[str]]:
+    """Return (empty dirs, removable files inside them) from a bottom-up walk.
+
+    Children are listed before their parent, so by the time a directory is
+    seen we already know which of its subdirectories are empty. A directory
+    is empty when every subdirectory is empty, it has no other entries and
+    every file is removable. Only the frontier of not-yet-claimed empty
+    children is kept in memory. The directory keep (usually the walk root)
+    is never returned, nor are the files in it.
+    """
+    empty: Set[str] = set()
+    empty_dirs: List[str] = []
+    files_to_remove: List[str] = []
+    for listing in listings:
+        children = [os.path.join(listing.path, name) for name in listing.dirs]
+        empty_children = sum(1 for child in children if child in empty)
+        empty.difference_update(children)
+        if listing.other or empty_children != len(children):
+            continue
+        if listing.files and (removable is None or not all(removable(record) for record in listing.files)):
             continue
-        empty_dirs.append(Path(dirpath))
-    return empty_dirs
+        if listing.path == keep:
+            continue
+        empty.add(listing.path)
+        empty_dirs.append(listing.path)
+        files_to_remove.extend(record.path for record in listing.files)
+    return empty_dirs, files_to_remove
+
+
+def find_empty_dirs(
+    root: Path,
+    stats: Optional[RunStats] = None,
+    ignore_files: Iterable[str] = (),
+    walk_threads: int = 1,
+    remove_root: bool = False,
+) -> Tuple[List[Path], List[str]]:
+    """Return (empty dirs deepest first, ignorable files to delete with them).
+
+    root is only included when remove_root is set and the whole tree is empty.
+    """
+    ignorable = make_skip_matcher(ignore_files)
+
+    def listings() -> Iterable[DirListing]:
+        for listing in walk(root, topdown=False, stat=False, threads=walk_threads):
+            if stats is not None:
+                stats.record_dir()
+                stats.record_files(len(listing.files), 0)
+            yield listing
+
+    removable = (lambda record: ignorable(os.path.basename(record.path))) if ignorable else None
+    empty_dirs, files = collect_empty_dirs(listings(), removable, None if remove_root else os.fspath(root))
+    return [Path(path) for path in empty_dirs], files
 
 
-def remove_empty_dirs(empty_dirs: List[Path], dry_run: bool) -> int:
-    removed = 0
+def remove_empty_dirs(
+    empty_dirs: List[Path], dry_run: bool, action_log: Optional[Path] = None, files: Iterable[str] = ()
+) -> int:
+    plan = DeletePlan()
+    for path in files:
+        plan.unlink(path)
     for path in empty_dirs:
-        if dry_run:
-            print(f"[dry-run] remove {path}")
-        else:
-            path.rmdir()
-            print(f"removed {path}")
-        removed += 1
-    return removed
+        plan.rmdir(str(path))
+    return execute_plan(plan, dry_run, action_log).count(RMDIR)
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Remove empty folders from a directory tree.")
     parser.add_argument("root", type=Path, help="Root directory to clean")
     parser.add_argument("--dry-run", action="store_true", help="Print folders that would be removed")
+    parser.add_argument(
+        "--ignore-file",
+        action="append",
+        default=[],
+        help="File name or glob that does not count as content (repeatable)",
+    )
+    parser.add_argument(
+        "--ignore-junk",
+        action="store_true",
+        help=f"Treat OS junk files as empty ({', '.join(JUNK_FILES)})",
+    )
+    parser.add_argument(
+        "--remove-root",
+        action="store_true",
+        help="Also remove the root folder when everything under it is empty",
+    )
+    add_walk_args(parser, skip_dirs=False, follow_symlinks=False, walk_ordered=False)
+    add_stats_args(parser)
+    add_action_log_args(parser)
     return parser.parse_args()
 
 
@@ -48,9 +130,18 @@ def main() -> None:
     if not args.root.is_dir():
         raise SystemExit(f"root is not a directory: {args.root}")
 
-    empty_dirs = find_empty_dirs(args.root)
-    removed = remove_empty_dirs(empty_dirs, args.dry_run)
+    stats = RunStats(args.progress)
+    ignore_files = list(args.ignore_file) + (list(JUNK_FILES) if args.ignore_junk else [])
+    with stats.phase("walk"):
+        empty_dirs, files = find_empty_dirs(args.root, stats, ignore_files, args.walk_threads, args.remove_root)
+    stats.finish()
+    with stats.phase("delete"):
+        removed = remove_empty_dirs(empty_dirs, args.dry_run, args.action_log, files)
+    stats.count("removed", removed)
+    stats.count("ignored_files_removed", len(files))
     print(f"Done. Removed {removed} empty folders.")
+    if args.stats_json:
+        stats.write_json(args.stats_json)
 
 
 if __name__ == "__main__":
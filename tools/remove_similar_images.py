@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Remove near-duplicate images (resized or re-encoded copies), keeping one per set.
+
+Usage:
+  python remove_similar_images.py /path/to/photos [--hash ahash|dhash|phash] [--radius N]
+      [--keep POLICY ...] [--ext .jpg ...] [--workers N] [--batch-files N] [--dry-run]
+      [--skip-dir NAME] [--follow-symlinks] [--walk-threads N [--walk-ordered]] [--progress] [--stats-json PATH]
+      [--action-log PATH]
+
+Notes:
+  - Needs Pillow: pip install -r tools/requirements.txt
+  - Each image gets a 64-bit perceptual hash (see image_hashes.py) computed in
+    the worker pool. Distinct hashes go into a multi-index hash table and each
+    one is looked up once with --radius, so images are never compared
+    all-pairs.
+  - Images within --radius bits of each other are linked into candidate
+    sets. Within a set the --keep policy picks a copy to keep and only images
+    within --radius bits of it are removed; the rest are clustered again the
+    same way, so a chain of small edits never removes an image further than
+    --radius from the copy that is kept. Use --dry-run first.
+  - --keep works as in remove_duplicates_roots.py (default: shortest);
+    "largest" keeps the biggest file, usually the least compressed copy.
+  - Files that cannot be decoded are counted and left alone.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from bulk_delete import DeletePlan, add_action_log_args, run_plan
+from checksums import BATCH_BYTES, BATCH_FILES, Prefetch, Schedule, iter_checksums
+from image_hashes import HASHES, MultiIndexHash, hamming, image_hash, require_pillow
+from keep_policies import KEEP_POLICIES, make_select_keep
+from run_stats import RunStats, add_stats_args
+from walker import FileRecord, add_walk_args, iter_files
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+DEFAULT_RADIUS = 6
+
+
+def hash_images(
+    records: Iterable[FileRecord], algorithm: str, schedule: Schedule
+) -> Tuple[Dict[int, List[str]], int]:
+    """Return (hash -> paths, number of files that could not be decoded)."""
+    by_hash: Dict[int, List[str]] = {}
+    failed = 0
+    jobs = (((record.path, algorithm), record.size) for record in records)
+    for digest, path in iter_checksums(image_hash, jobs, schedule):
+        if not digest:
+            failed += 1
+            continue
+        by_hash.setdefault(int(digest, 16), []).append(path)
+    return by_hash, failed
+
+
+def group_similar(hashes: Iterable[int], radius: int) -> List[List[int]]:
+    """Return sets of hashes connected by links of at most radius bits."""
+    hashes = list(hashes)
+    index = MultiIndexHash(hashes, radius)
+    parent = {value: value for value in hashes}
+
+    def find(value: int) -> int:
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    for value in hashes:
+        for other, _ in index.search(value):
+            if other != value:
+                a, b = find(value), find(other)
+                if a != b:
+                    parent[b] = a
+
+    groups: Dict[int, List[int]] = {}
+    for value in hashes:
+        groups.setdefault(find(value), []).append(value)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def cluster_around_keep(
+    paths: List[str],
+    hash_of: Dict[str, int],
+    radius: int,
+    select_keep: Callable[[List[str]], Tuple[str, List[str]]],
+) -> List[Tuple[str, List[str]]]:
+    """Split a candidate set into (keep, paths within radius of keep) clusters."""
+    clusters = []
+    remaining = paths
+    while len(remaining) > 1:
+        keep, others = select_keep(remaining)
+        near = [path for path in others if hamming(hash_of[path], hash_of[keep]) <= radius]
+        if near:
+            clusters.append((keep, near))
+        near_set = set(near)
+        remaining = [path for path in others if path not in near_set]
+    return clusters
+
+
+def plan_similar(
+    by_hash: Dict[int, List[str]], radius: int, select_keep: Callable[[List[str]], Tuple[str, List[str]]]
+) -> DeletePlan:
+    plan = DeletePlan()
+    groups = group_similar(by_hash, radius) if radius else []
+    grouped: Set[int] = {value for group in groups for value in group}
+    # Paths sharing one hash are a set even when no other hash is near.
+    groups.extend([value] for value, paths in by_hash.items() if value not in grouped and len(paths) > 1)
+    for group in groups:
+        hash_of = {path: value for value in group for path in by_hash[value]}
+        for keep, remove_paths in cluster_around_keep(list(hash_of), hash_of, radius, select_keep):
+            for path in remove_paths:
+                distance = hamming(hash_of[path], hash_of[keep])
+                plan.unlink(path, f"similar to {keep}, distance {distance}", keep)
+    return plan
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Remove near-duplicate images using perceptual hashes.")
+    parser.add_argument("dir", type=Path, help="Directory to scan")
+    parser.add_argument("--hash", choices=sorted(HASHES), default="dhash", help="Perceptual hash to use")
+    parser.add_argument(
+        "--radius",
+        type=int,
+        default=DEFAULT_RADIUS,
+        help="Max differing bits (of 64) for two images to count as the same (0=identical hashes only)",
+    )
+    parser.add_argument(
+        "--keep",
+        action="append",
+        default=[],
+        help=f"Keep policy, repeatable ({', '.join(KEEP_POLICIES)}; default shortest)",
+    )
+    parser.add_argument(
+        "--ext",
+        action="append",
+        default=[],
+        help=f"Image extension to include, repeatable (default: {' '.join(IMAGE_EXTENSIONS)})",
+    )
+    parser.add_argument("--workers", type=int, default=0, help="Workers (0=auto, 1=single process)")
+    parser.add_argument("--batch-files", type=int, default=BATCH_FILES, help="Max images per worker task")
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES, help="Max bytes per worker task")
+    parser.add_argument("--dry-run", action="store_true", help="Print files that would be removed")
+    add_walk_args(parser)
+    add_stats_args(parser)
+    add_action_log_args(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.dir.is_dir():
+        raise SystemExit(f"dir is not a directory: {args.dir}")
+    if not 0 <= args.radius < 64:
+        raise SystemExit("--radius must be between 0 and 63")
+    require_pillow()
+    try:
+        select_keep = make_select_keep(args.keep or ["shortest"], [args.dir])
+    except ValueError as exc:
+        raise SystemExit(f"invalid --keep: {exc}")
+    extensions = {ext.lower() if ext.startswith(".") else "." + ext.lower() for ext in args.ext} or set(
+        IMAGE_EXTENSIONS
+    )
+
+    workers = args.workers
+    if workers == 0:
+        workers = max(os.cpu_count() or 1, 1)
+    stats = RunStats(args.progress)
+    # Decoding and the DCT are mostly Python-level work, so always use processes.
+    schedule = Schedule(workers, "process", args.batch_files, args.batch_bytes, stats)
+
+    files = iter_files(
+        args.dir, args.skip_dir, args.follow_symlinks, threads=args.walk_threads, ordered=args.walk_ordered
+    )
+    images = (record for record in files if os.path.splitext(record.path)[1].lower() in extensions)
+
+    print(f"Hashing images in {args.dir}")
+    with stats.phase("hash"):
+        by_hash, failed = hash_images(Prefetch(images, stats=stats), args.hash, schedule)
+    stats.finish()
+    print(f"Hashed {sum(len(paths) for paths in by_hash.values())} images, {failed} could not be decoded")
+    with stats.phase("grouping"):
+        plan = plan_similar(by_hash, args.radius, select_keep)
+    stats.count("undecodable", failed)
+
+    with stats.phase("delete"):
+        removed = run_plan(plan, args.dry_run, args.action_log)
+    stats.count("removed", removed)
+    print(f"Done. Removed {removed} files.")
+    if args.stats_json:
+        stats.write_json(args.stats_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Throughput counters, a live progress line and JSON stats for the file tools.
+
+Phases are wall-clock spans; the walk runs on its own thread and overlaps the
+phases that consume it, so phase times do not add up to the total.
+
+Files are counted once, as they are handed to the tool; hash jobs (a file
+may be hashed twice: partially, then in full) and the bytes they read are
+counted separately.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+PROGRESS_INTERVAL = 0.5  # seconds between progress line updates
+MIB = 1024 * 1024
+SIZE_BUCKETS = [(4 * 1024, "<4KiB"), (64 * 1024, "<64KiB"), (MIB, "<1MiB"), (16 * MIB, "<16MiB")]
+SIZE_BUCKET_LAST = ">=16MiB"
+LATENCY_BUCKETS = [(0.001, "<1ms"), (0.01, "<10ms"), (0.1, "<100ms"), (1.0, "<1s")]
+LATENCY_BUCKET_LAST = ">=1s"
+
+
+def worker_id() -> str:
+    return f"{os.getpid()}:{threading.current_thread().name}"
+
+
+def peak_rss_kib() -> Optional[int]:
+    """Peak resident set size of this process in KiB, or None if unknown."""
+    # VmHWM starts over at exec; ru_maxrss may carry the forking parent's peak.
+    try:
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB on Linux
+
+
+def bucket(value: float, buckets: List, last: str) -> str:
+    for limit, label in buckets:
+        if value < limit:
+            return label
+    return last
+
+
+def add_stats_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--progress", action="store_true", help="Show a live progress line on stderr")
+    parser.add_argument("--stats-json", type=Path, help="Write timings and throughput stats to this JSON file")
+
+
+class RunStats:
+    def __init__(self, progress: bool = False) -> None:
+        self.progress = progress
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.estimates: Dict[str, float] = {}  # derived figures in seconds, not measured time
+        self.counters: Dict[str, int] = {}
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        self.hashes = 0
+        self.hashed_bytes = 0
+        self.worker_bytes: Dict[str, int] = {}
+        self.latency: Dict[str, Dict[str, int]] = {}
+        self.busy_estimate = 0  # workers with a batch in flight, as far as the scheduler can tell
+        self.workers = 0
+        self.queue_depth: Optional[Callable[[], int]] = None
+        self._lock = threading.Lock()
+        self._last_progress = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def estimate(self, name: str, seconds: float) -> None:
+        self.estimates[name] = seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_file(self, size: int = 0) -> None:
+        self.record_files(1, max(size, 0))
+
+    def record_files(self, count: int, size: int) -> None:
+        self.files += count
+        self.bytes += size
+        self.tick()
+
+    def record_dir(self) -> None:
+        """Record one directory listed; directories are not counted as files."""
+        self.dirs += 1
+        self.tick()
+
+    def record_hash(self, worker: str, size: int, seconds: float) -> None:
+        """Record one hash job; size is the number of bytes it read."""
+        self.hashes += 1
+        self.hashed_bytes += size
+        self.worker_bytes[worker] = self.worker_bytes.get(worker, 0) + size
+        by_latency = self.latency.setdefault(bucket(size, SIZE_BUCKETS, SIZE_BUCKET_LAST), {})
+        label = bucket(seconds, LATENCY_BUCKETS, LATENCY_BUCKET_LAST)
+        by_latency[label] = by_latency.get(label, 0) + 1
+        self.tick()
+
+    def tick(self) -> None:
+        if not self.progress:
+            return
+        now = time.perf_counter()
+        if now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        elapsed = max(now - self.started, 1e-9)
+        line = f"{self.files} files  {self.files / elapsed:.0f} files/s"
+        if self.dirs:
+            line += f"  {self.dirs} dirs"
+        if self.hashes:
+            line += f"  {self.hashes} hashes  {self.hashed_bytes / MIB / elapsed:.1f} MiB/s read"
+        if self.queue_depth is not None:
+            line += f"  queue {self.queue_depth()}"
+        if self.workers:
+            line += f"  busy ~{self.busy_estimate}/{self.workers}"
+        sys.stderr.write(f"\r{line}\033[K")
+        sys.stderr.flush()
+
+    def finish(self) -> None:
+        """End the progress line, so a report printed next starts on its own line."""
+        if self.progress and self._last_progress:
+            sys.stderr.write("\n")
+            self._last_progress = 0.0
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed_s": elapsed,
+            "phases_s": self.phases,
+            "estimates_s": self.estimates,
+            "files": self.files,
+            "dirs": self.dirs,
+            "bytes": self.bytes,
+            "files_per_s": self.files / elapsed if elapsed else 0.0,
+            "mib_per_s": self.bytes / MIB / elapsed if elapsed else 0.0,
+            "hashes": self.hashes,
+            "hashed_bytes": self.hashed_bytes,
+            "hashed_mib_per_s": self.hashed_bytes / MIB / elapsed if elapsed else 0.0,
+            "counters": self.counters,
+            "worker_bytes": self.worker_bytes,
+            "hash_latency_by_size": self.latency,
+            "peak_rss_kib": peak_rss_kib(),
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
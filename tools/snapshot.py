@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Record tree snapshots and report what changed between them.
+
+Usage:
+  python snapshot.py take /path/to/root nightly.snap [--hash] [--base previous.snap]
+      [--skip-dir NAME] [--follow-symlinks] [--walk-threads N] [--workers N]
+  python snapshot.py diff old.snap new.snap [--json]
+  python snapshot.py diff old.snap /path/to/root [--hash] [--json]
+
+Notes:
+  - A snapshot holds path, size, mtime, inode and device of every file, plus
+    a digest with --hash. It is a gzip-compressed sequence of fixed-width
+    records with paths relative to the root.
+  - --base reuses the digests of a previous snapshot: a file whose size,
+    mtime and inode are unchanged is not read again.
+  - diff reports added (A), removed (D), modified (M) and moved (R) files. A
+    file whose metadata changed but whose digest did not is not modified.
+    Moves are matched by inode, or by digest when both sides have one.
+  - Diffing against a live tree walks it once and, with --hash, only hashes
+    files whose metadata differs from the snapshot.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from checksums import Schedule, file_checksum, iter_checksums
+from manifest import DIGEST_NAME
+from walker import add_walk_args, iter_files
+
+
+MAGIC = b"DDSNAP01"
+LENGTH = struct.Struct(">I")
+RECORD = struct.Struct(">HQqQQB")  # path length, size, mtime_ns, inode, dev, digest length
+
+
+class Entry(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+    dev: int
+    digest: bytes  # empty when the snapshot was taken without --hash
+
+
+@dataclass
+class Snapshot:
+    root: str
+    hashed: bool
+    taken: float = field(default_factory=time.time)
+    entries: Dict[str, Entry] = field(default_factory=dict)  # keyed on path relative to root
+
+    def write(self, path: Path) -> None:
+        header = json.dumps(
+            {"root": self.root, "hashed": self.hashed, "taken": self.taken, "digest": DIGEST_NAME}
+        ).encode("utf-8")
+        with gzip.open(path, "wb") as handle:
+            handle.write(MAGIC + LENGTH.pack(len(header)) + header)
+            chunk: List[bytes] = []
+            for relpath in sorted(self.entries):
+                entry = self.entries[relpath]
+                name = os.fsencode(relpath)
+                chunk.append(
+                    RECORD.pack(len(name), entry.size, entry.mtime_ns, entry.inode, entry.dev, len(entry.digest))
+                    + entry.digest
+                    + name
+                )
+                if len(chunk) >= 4096:
+                    handle.write(b"".join(chunk))
+                    chunk = []
+            handle.write(b"".join(chunk))
+
+    @classmethod
+    def read(cls, path: Path) -> "Snapshot":
+        """Load a snapshot; ValueError if path is not a valid snapshot."""
+        with gzip.open(path, "rb") as handle:
+            try:
+                if handle.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"not a snapshot: {path}")
+                header = json.loads(handle.read(LENGTH.unpack(handle.read(LENGTH.size))[0]))
+                if header["hashed"] and header["digest"] != DIGEST_NAME:
+                    raise ValueError(f"snapshot {path} uses {header['digest']} digests, expected {DIGEST_NAME}")
+                snapshot = cls(header["root"], header["hashed"], header["taken"])
+                while True:
+                    fixed = handle.read(RECORD.size)
+                    if not fixed:
+                        break
+                    name_size, size, mtime_ns, inode, dev, digest_size = RECORD.unpack(fixed)
+                    digest = handle.read(digest_size)
+                    name = handle.read(name_size)
+                    if len(digest) != digest_size or len(name) != name_size:
+                        raise ValueError(f"truncated snapshot: {path}")
+                    snapshot.entries[os.fsdecode(name)] = Entry(size, mtime_ns, inode, dev, digest)
+            except (
+                gzip.BadGzipFile,
+                EOFError,
+                struct.error,
+                json.JSONDecodeError,
+                UnicodeDecodeError,
+                KeyError,
+                TypeError,
+            ):
+                raise ValueError(f"not a snapshot, or damaged: {path}") from None
+        return snapshot
+
+
+def load_snapshot(path: Path) -> Snapshot:
+    """Snapshot.read for the command line: a missing or damaged file exits with a message."""
+    if not path.is_file():
+        raise SystemExit(f"no snapshot at {path}")
+    try:
+        return Snapshot.read(path)
+    except ValueError as exc:
+        raise SystemExit(f"cannot read snapshot: {exc}")
+
+
+def same_metadata(a: Entry, b: Entry) -> bool:
+    return a.size == b.size and a.mtime_ns == b.mtime_ns and a.inode == b.inode and a.dev == b.dev
+
+
+def take_snapshot(
+    root: Path,
+    hash_files: bool = False,
+    base: Optional[Snapshot] = None,
+    skip_dirs: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    schedule: Optional[Schedule] = None,
+    walk_threads: int = 1,
+) -> Snapshot:
+    """Walk root into a Snapshot; with hash_files, hash only what base cannot vouch for."""
+    root_str = os.fspath(root)
+    snapshot = Snapshot(root_str, hash_files)
+    to_hash: List[Tuple[Tuple, int]] = []
+    for record in iter_files(root, skip_dirs, follow_symlinks, threads=walk_threads):
+        relpath = os.path.relpath(record.path, root_str)
+        entry = Entry(record.size, record.mtime_ns, record.inode, record.dev, b"")
+        if hash_files:
+            previous = base.entries.get(relpath) if base is not None and base.hashed else None
+            if previous is not None and same_metadata(previous, entry):
+                entry = previous
+            else:
+                to_hash.append(((record.path,), record.size))
+        snapshot.entries[relpath] = entry
+    if to_hash:
+        for digest, path in iter_checksums(file_checksum, to_hash, schedule or Schedule(1)):
+            relpath = os.path.relpath(path, root_str)
+            snapshot.entries[relpath] = snapshot.entries[relpath]._replace(digest=bytes.fromhex(digest))
+    return snapshot
+
+
+@dataclass
+class SnapshotDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    moved: List[Tuple[str, str]] = field(default_factory=list)
+
+    def lines(self) -> Iterable[str]:
+        for path in self.added:
+            yield f"A {path}"
+        for path in self.removed:
+            yield f"D {path}"
+        for path in self.modified:
+            yield f"M {path}"
+        for old, new in self.moved:
+            yield f"R {old} -> {new}"
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> SnapshotDiff:
+    diff = SnapshotDiff()
+    compare_digests = old.hashed and new.hashed
+    added = [path for path in new.entries if path not in old.entries]
+    removed = {path: old.entries[path] for path in old.entries if path not in new.entries}
+
+    for path, entry in new.entries.items():
+        previous = old.entries.get(path)
+        if previous is None or same_metadata(previous, entry):
+            continue
+        if compare_digests and previous.size == entry.size and previous.digest == entry.digest:
+            continue  # touched, same content
+        diff.modified.append(path)
+
+    # A move keeps the inode; without that, equal digests and sizes will do.
+    by_inode = {(entry.dev, entry.inode): path for path, entry in removed.items()}
+    by_content = {(entry.size, entry.digest): path for path, entry in removed.items()} if compare_digests else {}
+    for path in added:
+        entry = new.entries[path]
+        source = by_inode.get((entry.dev, entry.inode))
+        if source not in removed or removed[source].size != entry.size:
+            source = by_content.get((entry.size, entry.digest))
+        if source in removed:
+            del removed[source]
+            diff.moved.append((source, path))
+        else:
+            diff.added.append(path)
+    diff.removed = list(removed)
+    for paths in (diff.added, diff.removed, diff.modified):
+        paths.sort()
+    diff.moved.sort()
+    return diff
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record tree snapshots and diff them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    take = commands.add_parser("take", help="Write a snapshot of a tree")
+    take.add_argument("root", type=Path, help="Directory to record")
+    take.add_argument("output", type=Path, help="Snapshot file to write")
+    take.add_argument("--base", type=Path, help="Earlier snapshot whose digests may be reused")
+
+    diff = commands.add_parser("diff", help="Compare a snapshot with another snapshot or a live tree")
+    diff.add_argument("old", type=Path, help="Earlier snapshot")
+    diff.add_argument("new", type=Path, help="Later snapshot, or a directory to compare live")
+    diff.add_argument("--json", action="store_true", help="Print the changes as JSON")
+
+    for command in (take, diff):
+        command.add_argument("--hash", action="store_true", help="Record content digests (only for changed files)")
+        # Snapshots are written sorted, so the walk order never shows.
+        add_walk_args(command, walk_ordered=False)
+        command.add_argument("--workers", type=int, default=0, help="Hashing workers (0=auto, 1=single process)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    workers = args.workers or max(os.cpu_count() or 1, 1)
+    schedule = Schedule(workers)
+
+    if args.command == "take":
+        if not args.root.is_dir():
+            raise SystemExit(f"root is not a directory: {args.root}")
+        base = load_snapshot(args.base) if args.base else None
+        snapshot = take_snapshot(
+            args.root, args.hash, base, args.skip_dir, args.follow_symlinks, schedule, args.walk_threads
+        )
+        snapshot.write(args.output)
+        print(f"Recorded {len(snapshot.entries)} files in {args.output}")
+        return
+
+    old = load_snapshot(args.old)
+    if args.new.is_dir():
+        # Hashing against a snapshot without digests would prove nothing.
+        new = take_snapshot(
+            args.new, args.hash and old.hashed, old, args.skip_dir, args.follow_symlinks, schedule, args.walk_threads
+        )
+    else:
+        new = load_snapshot(args.new)
+    diff = diff_snapshots(old, new)
+    if args.json:
+        json.dump(
+            {"added": diff.added, "removed": diff.removed, "modified": diff.modified, "moved": diff.moved},
+            sys.stdout,
+            indent=2,
+        )
+        print()
+        return
+    for line in diff.lines():
+        print(line)
+    print(
+        f"{len(diff.added)} added, {len(diff.removed)} removed, "
+        f"{len(diff.modified)} modified, {len(diff.moved)} moved"
+    )
+
+
+if __name__ == "__main__":
+    main()
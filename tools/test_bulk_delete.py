@@ -0,0 +1,60 @@
+import os
+
+from bulk_delete import RMDIR, UNLINK, DeletePlan, apply_plan
+
+
+def test_action_log_round_trip(tmp_path):
+    plan = DeletePlan()
+    plan.unlink(str(tmp_path / "a" / "copy.txt"), "duplicate", str(tmp_path / "b" / "orig.txt"))
+    plan.unlink(str(tmp_path / "a" / "other.txt"))
+    plan.rmdir(str(tmp_path / "a"), "empty")
+    log = tmp_path / "plan.log"
+    plan.write_log(log)
+    assert list(DeletePlan.read_log(log).entries()) == list(plan.entries())
+
+
+def test_action_log_stores_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    plan = DeletePlan()
+    plan.unlink(os.path.join("a", "copy.txt"), keep=os.path.join("b", "orig.txt"))
+    log = tmp_path / "plan.log"
+    plan.write_log(log)
+    assert list(DeletePlan.read_log(log).entries()) == [
+        (UNLINK, str(tmp_path / "a" / "copy.txt"), "", str(tmp_path / "b" / "orig.txt"))
+    ]
+
+
+def test_duplicate_is_kept_when_kept_copy_is_gone(tmp_path):
+    copy = tmp_path / "copy.txt"
+    copy.write_text("x")
+    plan = DeletePlan()
+    plan.unlink(str(copy), keep=str(tmp_path / "gone.txt"))
+    done, errors = apply_plan(plan)
+    assert len(done) == 0
+    assert [path for path, _ in errors] == [str(copy)]
+    assert copy.exists()
+
+
+def test_link_to_the_kept_copy_is_not_removed(tmp_path):
+    original = tmp_path / "original.txt"
+    original.write_text("x")
+    link = tmp_path / "link.txt"
+    os.link(original, link)
+    plan = DeletePlan()
+    plan.unlink(str(link), keep=str(original))
+    done, errors = apply_plan(plan)
+    assert len(done) == 0 and len(errors) == 1
+    assert link.exists()
+
+
+def test_apply_removes_files_then_emptied_dirs(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "copy.txt").write_text("x")
+    (tmp_path / "orig.txt").write_text("x")
+    plan = DeletePlan()
+    plan.rmdir(str(tmp_path / "a"))
+    plan.unlink(str(tmp_path / "a" / "copy.txt"), keep=str(tmp_path / "orig.txt"))
+    done, errors = apply_plan(plan)
+    assert errors == []
+    assert done.count(UNLINK) == 1 and done.count(RMDIR) == 1
+    assert sorted(os.listdir(tmp_path)) == ["orig.txt"]
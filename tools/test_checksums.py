@@ -0,0 +1,46 @@
+from checksums import PARTIAL_SIZE, Schedule, build_checksum_index, build_staged_index
+from walker import iter_files
+
+
+def make_tree(root):
+    # two.bin and three.bin share size, head and tail (the partial stage reads
+    # PARTIAL_SIZE bytes from each end), so only the full hash tells them apart.
+    half = PARTIAL_SIZE * 2
+    contents = {
+        "a/one.bin": b"m" * (2 * half),
+        "b/one.bin": b"m" * (2 * half),
+        "c/two.bin": b"n" * (2 * half),
+        "c/three.bin": b"n" * half + b"x" + b"n" * (half - 1),
+        "d/small.txt": b"x",
+        "d/small-copy.txt": b"x",
+        "d/unique.txt": b"only one of this size",
+        "e/empty": b"",
+        "e/empty-too": b"",
+    }
+    for name, data in contents.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def duplicate_sets(index):
+    return sorted(sorted(paths) for paths in index.values() if len(paths) > 1)
+
+
+def test_staged_index_matches_full_index(tmp_path):
+    make_tree(tmp_path)
+    full = build_checksum_index(iter_files(tmp_path), Schedule(1))
+    for compact in (False, True):
+        staged, stages = build_staged_index(iter_files(tmp_path), Schedule(1), compact=compact)
+        assert duplicate_sets(staged) == duplicate_sets(full)
+        assert [stage.name for stage in stages] == ["size", "partial", "full"]
+
+
+def test_staged_index_hashes_only_candidates(tmp_path):
+    make_tree(tmp_path)
+    _, (size, partial, full) = build_staged_index(iter_files(tmp_path), Schedule(1))
+    assert size.files == 9
+    assert size.dropped == 1  # the only file of its size
+    assert partial.files == 8
+    assert full.files == 8
+    assert full.dropped == 2  # same size and partial hash, different content
@@ -0,0 +1,65 @@
+import pytest
+
+from compact_index import CompactIndex
+
+
+def digest(byte):
+    return (bytes([byte]) * 32).hex()
+
+
+def build(pairs, min_group=1):
+    index = CompactIndex()
+    for hex_digest, path in pairs:
+        index.add(hex_digest, path)
+    dropped = index.finalize(min_group)
+    return index, dropped
+
+
+def test_lookups_match_a_dict_index():
+    pairs = [
+        (digest(9), "/r/a/x"),
+        (digest(1), "/r/b/y"),
+        (digest(9), "/r/c/x"),
+        (digest(200), "/r/ü/z"),
+        (digest(1), "/r/b/y2"),
+    ]
+    index, dropped = build(pairs)
+    expected = {}
+    for hex_digest, path in pairs:
+        expected.setdefault(hex_digest, []).append(path)
+    assert dropped == 0
+    assert len(index) == len(expected)
+    assert {key: sorted(paths) for key, paths in index.items()} == {
+        key: sorted(paths) for key, paths in expected.items()
+    }
+    for key, paths in expected.items():
+        assert sorted(index[key]) == sorted(paths)
+        assert key in index
+    assert list(index) == sorted(expected)
+
+
+def test_missing_digest_raises_key_error():
+    index, _ = build([(digest(5), "/a"), (digest(7), "/b")])
+    for missing in (digest(0), digest(6), digest(255)):
+        with pytest.raises(KeyError):
+            index[missing]
+        assert missing not in index
+
+
+def test_min_group_drops_singletons():
+    index, dropped = build([(digest(1), "/a"), (digest(2), "/b"), (digest(2), "/c")], min_group=2)
+    assert dropped == 1
+    assert list(index.values()) == [["/b", "/c"]]
+
+
+def test_add_after_finalize_is_rejected():
+    index, _ = build([(digest(1), "/a")])
+    with pytest.raises(RuntimeError):
+        index.add(digest(2), "/b")
+
+
+def test_digest_size_must_not_change():
+    index = CompactIndex()
+    index.add(digest(1), "/a")
+    with pytest.raises(ValueError):
+        index.add("00" * 16, "/b")
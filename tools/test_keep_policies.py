@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from keep_policies import make_select_keep
+
+
+@pytest.mark.parametrize("spec", ["oldest", "newest", "largest"])
+def test_vanished_path_is_never_kept(tmp_path, spec):
+    present = tmp_path / "present.txt"
+    present.write_text("x")
+    gone = str(tmp_path / "a")  # shortest path, so only the stat key can rank it last
+    keep, remove = make_select_keep([spec], [])([gone, str(present)])
+    assert keep == str(present)
+    assert remove == [gone]
+
+
+def test_oldest_and_newest_use_mtime(tmp_path):
+    old, new = tmp_path / "old.txt", tmp_path / "new.txt"
+    old.write_text("x")
+    new.write_text("x")
+    os.utime(old, ns=(1_000_000_000, 1_000_000_000))
+    paths = [str(new), str(old)]
+    assert make_select_keep(["oldest"], [])(paths)[0] == str(old)
+    assert make_select_keep(["newest"], [])(paths)[0] == str(new)
@@ -0,0 +1,36 @@
+import pytest
+
+from manifest import merge_join, read_manifest, write_manifest
+
+
+def test_merge_join_yields_entries_present_in_manifest():
+    manifest = [(1, b"a"), (1, b"c"), (5, b"a"), (9, b"z")]
+    entries = [
+        (1, b"a", "first"),
+        (1, b"a", "second"),  # repeated key
+        (1, b"b", "missing"),
+        (5, b"a", "third"),
+        (7, b"a", "missing size"),
+        (9, b"z", "last"),
+        (10, b"a", "past the end"),
+    ]
+    assert list(merge_join(manifest, entries)) == ["first", "second", "third", "last"]
+
+
+def test_merge_join_with_empty_inputs():
+    assert list(merge_join([], [(1, b"a", "x")])) == []
+    assert list(merge_join([(1, b"a")], [])) == []
+
+
+def test_manifest_round_trip(tmp_path):
+    path = tmp_path / "tree.ddm"
+    entries = [(3, b"\x02" * 32), (1, b"\x01" * 32), (3, b"\x01" * 32)]
+    write_manifest(path, iter(entries), "sha256", 32)
+    assert list(read_manifest(path, "sha256")) == sorted(entries)
+
+
+def test_damaged_manifest_raises_value_error(tmp_path):
+    path = tmp_path / "bad.ddm"
+    path.write_bytes(b"not gzip at all")
+    with pytest.raises(ValueError):
+        list(read_manifest(path))
@@ -0,0 +1,41 @@
+from remove_empty_folders import find_empty_dirs
+from run_stats import RunStats
+
+
+def test_root_of_an_empty_tree_is_kept(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "c").mkdir()
+    empty_dirs, files = find_empty_dirs(tmp_path)
+    assert sorted(empty_dirs) == [tmp_path / "a", tmp_path / "a" / "b", tmp_path / "c"]
+    assert files == []
+
+
+def test_remove_root_includes_root_last(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    empty_dirs, _ = find_empty_dirs(tmp_path, remove_root=True)
+    assert empty_dirs == [tmp_path / "a" / "b", tmp_path / "a", tmp_path]
+
+
+def test_ignored_files_in_the_root_are_kept(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / ".DS_Store").write_text("")
+    (tmp_path / "a" / ".DS_Store").write_text("")
+    empty_dirs, files = find_empty_dirs(tmp_path, ignore_files=[".DS_Store"])
+    assert empty_dirs == [tmp_path / "a"]
+    assert files == [str(tmp_path / "a" / ".DS_Store")]
+
+
+def test_root_with_content_is_kept(tmp_path):
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "keep.txt").write_text("x")
+    empty_dirs, _ = find_empty_dirs(tmp_path, remove_root=True)
+    assert empty_dirs == [tmp_path / "empty"]
+
+
+def test_stats_count_files_and_dirs_apart(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "one.txt").write_text("x")
+    (tmp_path / "two.txt").write_text("x")
+    stats = RunStats()
+    find_empty_dirs(tmp_path, stats)
+    assert (stats.files, stats.dirs) == (2, 3)
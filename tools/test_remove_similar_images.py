@@ -0,0 +1,32 @@
+from remove_similar_images import plan_similar
+
+
+def select_shortest(paths):
+    ordered = sorted(paths, key=lambda path: (len(path), path))
+    return ordered[0], ordered[1:]
+
+
+def test_chained_images_keep_radius_from_kept_copy():
+    # a-b and b-c are 2 bits apart, a-c is 4 bits apart.
+    by_hash = {0b0000: ["/p/a.jpg"], 0b0011: ["/p/bb.jpg"], 0b1111: ["/p/ccc.jpg"]}
+    plan = plan_similar(by_hash, 2, select_shortest)
+    removed = [path for _, path, _ in plan]
+    assert removed == ["/p/bb.jpg"]
+
+
+def test_far_members_form_their_own_cluster():
+    by_hash = {
+        0b000000: ["/p/a.jpg"],
+        0b000011: ["/p/bb.jpg"],
+        0b001111: ["/p/ccc.jpg"],
+        0b111111: ["/p/dddd.jpg"],
+    }
+    plan = plan_similar(by_hash, 2, select_shortest)
+    removed = sorted(path for _, path, _ in plan)
+    assert removed == ["/p/bb.jpg", "/p/dddd.jpg"]
+
+
+def test_identical_hashes_are_one_set():
+    by_hash = {0b1010: ["/p/a.jpg", "/p/copy/a.jpg"]}
+    plan = plan_similar(by_hash, 0, select_shortest)
+    assert [path for _, path, _ in plan] == ["/p/copy/a.jpg"]
@@ -0,0 +1,51 @@
+import os
+
+from walker import iter_files, walk
+
+
+def make_tree(root, width=6, depth=3):
+    def fill(directory, level):
+        (directory / "file.txt").write_text(str(level))
+        if level == depth:
+            return
+        for child in range(width if level == 0 else 2):
+            sub = directory / f"d{child}"
+            sub.mkdir()
+            fill(sub, level + 1)
+
+    fill(root, 0)
+
+
+def test_ordered_threaded_walk_matches_serial_order(tmp_path):
+    make_tree(tmp_path)
+    serial = [(listing.path, listing.dirs, [record.path for record in listing.files]) for listing in walk(tmp_path)]
+    for threads in (2, 4, 8):
+        threaded = [
+            (listing.path, listing.dirs, [record.path for record in listing.files])
+            for listing in walk(tmp_path, threads=threads, ordered=True)
+        ]
+        assert threaded == serial
+
+
+def test_unordered_threaded_walk_finds_the_same_files(tmp_path):
+    make_tree(tmp_path)
+    serial = sorted(record.path for record in iter_files(tmp_path))
+    assert sorted(record.path for record in iter_files(tmp_path, threads=4)) == serial
+
+
+def test_skip_dirs_prunes_by_name(tmp_path):
+    make_tree(tmp_path)
+    paths = [record.path for record in iter_files(tmp_path, skip_dirs=["d1"])]
+    assert paths
+    assert not any(f"{os.sep}d1{os.sep}" in path for path in paths)
+
+
+def test_symlinked_files_are_never_yielded(tmp_path):
+    (tmp_path / "deep").mkdir()
+    (tmp_path / "deep" / "original.txt").write_text("x")
+    os.symlink(os.path.join("deep", "original.txt"), tmp_path / "link.txt")
+    os.symlink("deep", tmp_path / "linked-dir")
+    for follow_symlinks in (False, True):
+        paths = [record.path for record in iter_files(tmp_path, follow_symlinks=follow_symlinks)]
+        # A directory and a symlink to it are entered once between them.
+        assert [os.path.basename(path) for path in paths] == ["original.txt"]
@@ -0,0 +1,291 @@
+"""Directory walker shared by the file tools.
+
+Built on os.scandir so file type and inode come from the directory entry
+itself. Each file is stat'ed at most once (and not at all with stat=False),
+and the result travels with the path as a FileRecord.
+
+With threads > 1 directories are listed by a thread pool, several at a
+time, which hides the per-listing round trip on network filesystems.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+
+WALK_LOOKAHEAD = 4  # directory listings in flight per walk thread
+
+
+class FileRecord(NamedTuple):
+    path: str
+    size: int  # -1 when walked with stat=False
+    mtime_ns: int  # -1 when walked with stat=False
+    inode: int
+    dev: int  # -1 when walked with stat=False
+
+
+class DirListing(NamedTuple):
+    path: str
+    dirs: List[str]  # subdirectories that will be descended into
+    files: List[FileRecord]
+    other: int  # entries that are neither: skipped dirs, unfollowed symlinks, sockets, ...
+
+
+# subdirectory names, files, other count, (dev, inode) per subdirectory
+ScanResult = Tuple[List[str], List[FileRecord], int, List[Tuple[int, int]]]
+
+
+def make_skip_matcher(patterns: Iterable[str]) -> Optional[Callable[[str], bool]]:
+    """Return a predicate on directory names, or None when nothing is skipped.
+
+    Plain names are compared exactly; patterns containing *, ? or [ are
+    fnmatch globs.
+    """
+    names: Set[str] = set()
+    globs: List[str] = []
+    for pattern in patterns:
+        if not pattern:
+            continue
+        if any(char in pattern for char in "*?["):
+            globs.append(fnmatch.translate(pattern))
+        else:
+            names.add(pattern)
+    if not names and not globs:
+        return None
+    if not globs:
+        return names.__contains__
+    glob_re = re.compile("|".join(globs))
+    return lambda name: name in names or glob_re.match(name) is not None
+
+
+def scan_dir(
+    dirpath: str,
+    skip: Optional[Callable[[str], bool]],
+    follow_symlinks: bool,
+    stat: bool,
+) -> ScanResult:
+    dirs: List[str] = []
+    dir_ids: List[Tuple[int, int]] = []
+    files: List[FileRecord] = []
+    other = 0
+    try:
+        entries = os.scandir(dirpath)
+    except OSError:
+        # Unreadable directories are skipped, as os.walk does.
+        return dirs, files, other, dir_ids
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if skip is not None and skip(entry.name):
+                        other += 1
+                        continue
+                    dirs.append(entry.name)
+                    if follow_symlinks:
+                        st = entry.stat()
+                        dir_ids.append((st.st_dev, st.st_ino))
+                    continue
+                # Symlinked files are never yielded, even with follow_symlinks:
+                # a deletion tool could otherwise keep the link and remove the
+                # only real copy it points to.
+                if entry.is_symlink() or not entry.is_file(follow_symlinks=False):
+                    other += 1
+                    continue
+                if stat:
+                    st = entry.stat(follow_symlinks=False)
+                    files.append(FileRecord(entry.path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev))
+                else:
+                    files.append(FileRecord(entry.path, -1, -1, entry.inode(), -1))
+            except OSError:
+                # Entry vanished or cannot be stat'ed; leave it alone.
+                other += 1
+    return dirs, files, other, dir_ids
+
+
+def add_walk_args(
+    parser: argparse.ArgumentParser, skip_dirs: bool = True, follow_symlinks: bool = True, walk_ordered: bool = True
+) -> None:
+    """Add --skip-dir, --follow-symlinks and --walk-ordered (unless disabled) and --walk-threads.
+
+    Tools whose output does not depend on the walk order, or that only walk
+    bottom-up (which keeps the single-threaded order anyway), leave out
+    --walk-ordered.
+    """
+    if skip_dirs:
+        parser.add_argument(
+            "--skip-dir",
+            action="append",
+            default=[],
+            help="Directory name or glob to skip (repeatable)",
+        )
+    if follow_symlinks:
+        parser.add_argument(
+            "--follow-symlinks",
+            action="store_true",
+            help="Follow symlinked directories (symlinked files are always skipped)",
+        )
+    parser.add_argument(
+        "--walk-threads",
+        type=int,
+        default=1,
+        help="Threads listing directories in parallel (helps on network filesystems)",
+    )
+    if walk_ordered:
+        parser.add_argument(
+            "--walk-ordered",
+            action="store_true",
+            help="With --walk-threads, keep the single-threaded walk order so output is deterministic",
+        )
+
+
+def walk(
+    root: Union[str, Path],
+    topdown: bool = True,
+    skip_dirs: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    stat: bool = True,
+    threads: int = 1,
+    ordered: bool = False,
+) -> Iterator[DirListing]:
+    """Yield a DirListing per directory, like os.walk.
+
+    With topdown=True callers may prune listing.dirs in place. Symlinked
+    directories are ignored unless follow_symlinks is set, in which case each
+    directory is entered at most once to avoid loops. Symlinked files are
+    always counted as other, never yielded.
+
+    threads > 1 lists up to threads * WALK_LOOKAHEAD directories at once.
+    Listings are then yielded as they complete unless ordered=True (or
+    topdown=False), which keeps the single-threaded order exactly.
+    """
+    skip = make_skip_matcher(skip_dirs)
+    root = os.fspath(root)
+    seen: Set[Tuple[int, int]] = set()
+    if follow_symlinks:
+        st = os.stat(root)
+        seen.add((st.st_dev, st.st_ino))
+
+    def make_listing(dirpath: str, result: ScanResult) -> DirListing:
+        dirs, files, other, dir_ids = result
+        if follow_symlinks:
+            unseen = []
+            for name, dir_id in zip(dirs, dir_ids):
+                # Checked one by one so a directory and a symlink to it in
+                # the same listing are not both entered.
+                if dir_id in seen:
+                    other += 1
+                    continue
+                seen.add(dir_id)
+                unseen.append(name)
+            dirs = unseen
+        return DirListing(dirpath, dirs, files, other)
+
+    if threads > 1:
+        if ordered or not topdown:
+            yield from _walk_ordered(root, topdown, threads, make_listing, skip, follow_symlinks, stat)
+        else:
+            yield from _walk_unordered(root, threads, make_listing, skip, follow_symlinks, stat)
+        return
+
+    stack: List[Tuple[str, Optional[DirListing]]] = [(root, None)]
+    while stack:
+        dirpath, listing = stack.pop()
+        if listing is not None:
+            yield listing
+            continue
+        listing = make_listing(dirpath, scan_dir(dirpath, skip, follow_symlinks, stat))
+        if topdown:
+            yield listing
+        else:
+            stack.append((dirpath, listing))
+        for name in reversed(listing.dirs):
+            stack.append((os.path.join(dirpath, name), None))
+
+
+def _walk_unordered(
+    root: str,
+    threads: int,
+    make_listing: Callable[[str, ScanResult], DirListing],
+    skip: Optional[Callable[[str], bool]],
+    follow_symlinks: bool,
+    stat: bool,
+) -> Iterator[DirListing]:
+    # Depth-first frontier, so it stays about as small as the serial walk's.
+    limit = threads * WALK_LOOKAHEAD
+    frontier = [root]
+    running: Dict[Future, str] = {}
+    with ThreadPoolExecutor(threads, thread_name_prefix="walk") as pool:
+        while frontier or running:
+            while frontier and len(running) < limit:
+                dirpath = frontier.pop()
+                running[pool.submit(scan_dir, dirpath, skip, follow_symlinks, stat)] = dirpath
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirpath = running.pop(future)
+                listing = make_listing(dirpath, future.result())
+                yield listing
+                frontier.extend(os.path.join(dirpath, name) for name in reversed(listing.dirs))
+
+
+def _walk_ordered(
+    root: str,
+    topdown: bool,
+    threads: int,
+    make_listing: Callable[[str, ScanResult], DirListing],
+    skip: Optional[Callable[[str], bool]],
+    follow_symlinks: bool,
+    stat: bool,
+) -> Iterator[DirListing]:
+    # The serial walk's stack, with scans started ahead for the entries
+    # nearest its top (the next ones to be popped). At most limit scans run
+    # at once, and at most WALK_LOOKAHEAD * limit finished ones wait their turn.
+    limit = threads * WALK_LOOKAHEAD
+    stack: List[List] = [[root, None, None]]  # [path, scan future, finished listing]
+    running: Set[Future] = set()
+    started = 0
+    with ThreadPoolExecutor(threads, thread_name_prefix="walk") as pool:
+        while stack:
+            running = {future for future in running if not future.done()}
+            position = len(stack) - 1
+            while len(running) < limit and started < limit * WALK_LOOKAHEAD and position >= 0:
+                entry = stack[position]
+                if entry[1] is None and entry[2] is None:
+                    entry[1] = pool.submit(scan_dir, entry[0], skip, follow_symlinks, stat)
+                    running.add(entry[1])
+                    started += 1
+                position -= 1
+            dirpath, future, listing = stack.pop()
+            if listing is not None:
+                yield listing
+                continue
+            if future is None:
+                # Every slot is taken by scans further down the stack.
+                result = scan_dir(dirpath, skip, follow_symlinks, stat)
+            else:
+                started -= 1
+                result = future.result()
+            listing = make_listing(dirpath, result)
+            if topdown:
+                yield listing
+            else:
+                stack.append([dirpath, None, listing])
+            for name in reversed(listing.dirs):
+                stack.append([os.path.join(dirpath, name), None, None])
+
+
+def iter_files(
+    root: Union[str, Path],
+    skip_dirs: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    stat: bool = True,
+    threads: int = 1,
+    ordered: bool = False,
+) -> Iterator[FileRecord]:
+    for listing in walk(root, True, skip_dirs, follow_symlinks, stat, threads, ordered):
+        yield from listing.files